@@ -27,8 +27,6 @@ echo       Icon:   icon.ico
 python -m PyInstaller --noconsole --onefile ^
     --name="ClickCounter" ^
     --icon="icon.ico" ^
-    --hidden-import=win32gui ^
-    --hidden-import=win32process ^
     --add-data "config.json;." ^
     src/main.py
 
@@ -46,4 +44,19 @@ echo ==========================================
 echo    BUILD SUCCESSFUL!
 echo    File is located in: dist/ClickCounter.exe
 echo ==========================================
+
+REM ค่า SHA-256 นี้ต้องใส่ใน version.json ("sha256") ตัว updater จะตรวจก่อนติดตั้ง (ไม่มีค่านี้ = ไม่ยอมติดตั้ง)
+echo SHA-256 for version.json:
+certutil -hashfile dist\ClickCounter.exe SHA256 | findstr /v ":"
+
+REM Delta patch: วาง exe เวอร์ชันก่อนหน้าไว้ที่ previous\ClickCounter.exe แล้วตั้งค่า
+REM   set PREV_VERSION=v260118003
+REM   set NEW_VERSION=v260201001
+REM   set RELEASE_BASE_URL=https://github.com/Kasinchin/pp-click-counter/releases/download/%NEW_VERSION%/
+REM จะได้ dist\ClickCounter-<prev>-<new>.ccpatch และ version.json ที่อัปเดตแล้ว (อัปโหลดทั้งคู่ขึ้น release)
+if exist previous\ClickCounter.exe if not "%NEW_VERSION%"=="" (
+    echo Building delta patch %PREV_VERSION% -^> %NEW_VERSION%...
+    python tools\make_patch.py previous\ClickCounter.exe dist\ClickCounter.exe ^
+        --from %PREV_VERSION% --to %NEW_VERSION% --base-url %RELEASE_BASE_URL% --manifest version.json
+)
 pause
\ No newline at end of file
@@ -0,0 +1 @@
+"""Headless building blocks shared by the Click Counter UI (queue, sync, storage)."""
@@ -0,0 +1,79 @@
+import random
+import threading
+import time
+
+# --- Connectivity Circuit Breaker ---
+# closed    : endpoint looks healthy, live sends go straight to the network
+# open      : too many consecutive failures, everything goes to the queue
+#             until the (jittered, exponentially growing) retry time passes
+# half_open : retry time passed, exactly one probe request is allowed through
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=3, base_delay=5.0, max_delay=300.0, jitter=0.5,
+                 clock=time.monotonic, rng=random.random):
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self._clock = clock
+        self._rng = rng
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._retry_at = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def _next_delay(self):
+        delay = min(self.max_delay, self.base_delay * (2 ** max(0, self._failures - 1)))
+        # สุ่มกระจายเวลา เพื่อไม่ให้ทุกเครื่องกลับมายิงพร้อมกัน
+        return delay * (1 - self.jitter * self._rng())
+
+    def allow_request(self):
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and self._clock() >= self._retry_at:
+                self._state = HALF_OPEN
+                self._probe_in_flight = False
+            if self._state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._retry_at = 0.0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._retry_at = self._clock() + self._next_delay()
+            self._probe_in_flight = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = OPEN
+
+    def seconds_until_retry(self):
+        """How long a background retry loop should wait before its next attempt."""
+        with self._lock:
+            return max(0.0, self._retry_at - self._clock())
+
+
+def breaker_from_config(config):
+    return CircuitBreaker(
+        failure_threshold=config.get("breaker_failure_threshold", 3),
+        base_delay=config.get("backoff_base_seconds", 5),
+        max_delay=config.get("backoff_max_seconds", 300),
+    )
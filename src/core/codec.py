@@ -0,0 +1,184 @@
+import gzip
+import json
+
+from core.eventid import merged_event_id
+from core.record import FIELDS, ID_FIELD, to_json
+
+# --- Compact Upload Format ---
+# "cc1" batch layout (sent instead of a plain JSON array when
+# upload_format = "compact"):
+#
+#   {"format": "cc1",
+#    "dict":   {"types": [...], "items": [...], "clients": [...], "categories": [...]},
+#    "groups": [{"employees_name": ..., "date": ..., "base": <seconds since midnight>,
+#                "events": [[dt, type, item, counts, client, category(, extra)], ...],
+#                "ids": [event_id, ...]}]}      (only when the events carry IDs)
+#
+# Header fields are sent once per (employee, date) group, repeated strings
+# are dictionary encoded and timestamps are seconds relative to `base`.
+# The body may additionally be gzip'ed once the endpoint has advertised
+# "Accept-Encoding: gzip" in one of its responses.
+
+FORMAT_ID = "cc1"
+
+
+def _seconds(timestamp):
+    try:
+        h, m, s = (int(x) for x in timestamp.split(":"))
+        return h * 3600 + m * 60 + s
+    except (AttributeError, ValueError):
+        return 0
+
+
+def _clock(seconds):
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class _Dictionary:
+    def __init__(self):
+        self.values = []
+        self._index = {}
+
+    def code(self, value):
+        idx = self._index.get(value)
+        if idx is None:
+            idx = self._index[value] = len(self.values)
+            self.values.append(value)
+        return idx
+
+
+def aggregate_minutes(events):
+    """Net counts per (employee, date, type, item, client, category, minute).
+
+    For deployments that don't need per-click rows. Timestamps are truncated
+    to the minute; groups whose clicks cancel out are dropped. A merged row's
+    ID is derived from all of its members' IDs (core.eventid.merged_event_id),
+    so re-sending the same batch yields the same IDs and a changed group is
+    never mistaken for a duplicate. Fields missing from an input default to
+    "" (counts to 0).
+    """
+    merged = {}
+    ids = {}
+    for e in events:
+        minute = (e.get("timestamp") or "00:00:00")[:5] + ":00"
+        key = (e.get("employees_name"), e.get("date"), e.get("works_type"), e.get("works_detail"),
+               e.get("client_name"), e.get("events_category"), minute)
+        if key in merged:
+            merged[key]["counts"] += e.get("counts", 0)
+        else:
+            merged[key] = {f: e.get(f, "") for f in FIELDS}
+            merged[key]["counts"] = e.get("counts", 0)
+            merged[key]["timestamp"] = minute
+        if e.get(ID_FIELD):
+            ids.setdefault(key, []).append(e[ID_FIELD])
+    for key, members in ids.items():
+        merged[key][ID_FIELD] = merged_event_id(members)
+    return [e for e in merged.values() if e["counts"]]
+
+
+def encode_batch(events):
+    types, items, clients, categories = _Dictionary(), _Dictionary(), _Dictionary(), _Dictionary()
+    groups = {}
+    for e in events:
+        key = (e.get("employees_name", ""), e.get("date", ""))
+        groups.setdefault(key, []).append(e)
+
+    out_groups = []
+    for (employee, date), group in groups.items():
+        base = min(_seconds(e.get("timestamp")) for e in group)
+        rows = []
+        ids = []
+        for e in group:
+            row = [_seconds(e.get("timestamp")) - base, types.code(e.get("works_type", "")),
+                   items.code(e.get("works_detail", "")), e.get("counts", 0),
+                   clients.code(e.get("client_name", "")), categories.code(e.get("events_category", ""))]
+            extra = {k: v for k, v in e.items() if k not in FIELDS and k != ID_FIELD}
+            if extra:
+                row.append(extra)
+            rows.append(row)
+            ids.append(e.get(ID_FIELD))
+        out_group = {"employees_name": employee, "date": date, "base": base, "events": rows}
+        if any(ids):
+            out_group["ids"] = ids
+        out_groups.append(out_group)
+
+    return {
+        "format": FORMAT_ID,
+        "dict": {"types": types.values, "items": items.values,
+                 "clients": clients.values, "categories": categories.values},
+        "groups": out_groups,
+    }
+
+
+def decode_batch(payload):
+    """Inverse of encode_batch(); returns the list of plain event dicts."""
+    d = payload["dict"]
+    events = []
+    for group in payload["groups"]:
+        ids = group.get("ids") or ()
+        for n, row in enumerate(group["events"]):
+            event = {
+                "date": group["date"],
+                "timestamp": _clock(group["base"] + row[0]),
+                "employees_name": group["employees_name"],
+                "works_type": d["types"][row[1]],
+                "works_detail": d["items"][row[2]],
+                "counts": row[3],
+                "client_name": d["clients"][row[4]],
+                "events_category": d["categories"][row[5]],
+            }
+            if len(row) > 6:
+                event.update(row[6])
+            if n < len(ids) and ids[n]:
+                event[ID_FIELD] = ids[n]
+            events.append(event)
+    return events
+
+
+def decode_body(body, headers):
+    """Server side helper: gunzip if needed and return the list of events in any accepted format."""
+    if (headers.get("Content-Encoding") or "").lower() == "gzip":
+        body = gzip.decompress(body)
+    payload = json.loads(body)
+    if isinstance(payload, dict) and payload.get("format") == FORMAT_ID:
+        return decode_batch(payload)
+    return payload if isinstance(payload, list) else [payload]
+
+
+class UploadEncoder:
+    """Turns an event (or list of events) into a request body + headers per config."""
+
+    def __init__(self, fmt="json", use_gzip="auto", aggregate=False, gzip_min_bytes=512):
+        self.format = fmt
+        self.use_gzip = use_gzip
+        self.aggregate = aggregate
+        self.gzip_min_bytes = gzip_min_bytes
+        self.server_accepts_gzip = False
+
+    def encode(self, payload):
+        if self.aggregate and isinstance(payload, list):
+            # รวมรายนาทีเฉพาะ batch (bulk mode); event เดี่ยวส่งเป็น object ตามเดิม
+            payload = aggregate_minutes(payload)
+        if self.format == "compact":
+            payload = encode_batch(payload if isinstance(payload, list) else [payload])
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=to_json).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        gzip_on = self.use_gzip is True or (self.use_gzip == "auto" and self.server_accepts_gzip)
+        if gzip_on and len(body) >= self.gzip_min_bytes:
+            body = gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+        return body, headers
+
+    def observe(self, response):
+        # endpoint บอกว่ารับ gzip ได้ -> ครั้งต่อไปบีบอัด
+        accept = response.headers.get("Accept-Encoding", "") if response is not None else ""
+        if "gzip" in accept.lower():
+            self.server_accepts_gzip = True
+
+
+def encoder_from_config(config):
+    return UploadEncoder(
+        fmt=config.get("upload_format", "json"),
+        use_gzip=config.get("upload_gzip", "auto"),
+        aggregate=config.get("upload_aggregate", False),
+    )
@@ -0,0 +1,151 @@
+import json
+import os
+from functools import lru_cache
+
+from core.paths import data_path, resource_path
+from core.persist import WriteBehind, atomic_write_json
+from core.remoteconfig import cached_team_values
+from core.telemetry import metrics
+
+# --- Config Management ---
+
+DEFAULT_GAS_URL = "https://script.google.com/macros/s/AKfycbyyN39lbyWLoSzs5NkT70b-ZAga9NXCag8C-D7DXNXsaoviP_hcR2fUJKTfaoC1PFHa/exec"
+
+
+def bundled_config_file():
+    return resource_path("config.json")
+
+
+def user_config_file():
+    return data_path("config.json")
+
+
+@lru_cache(maxsize=1)
+def bootstrap_info():
+    """App name, version and update URL from the bundled config.json (read once, on first use)."""
+    info = {
+        "app_name": "ClickCounterApp",
+        "version": "1.0.0",
+        "update_check_url": ""
+    }
+    path = bundled_config_file()
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+                info["app_name"] = data.get("app_name", info["app_name"])
+                info["version"] = data.get("version", info["version"])
+                info["update_check_url"] = data.get("update_check_url", info["update_check_url"])
+        except Exception:
+            pass
+    return info
+
+
+def default_config():
+    return {
+        "employees_name": "Unknown Employee",
+        "gas_url": DEFAULT_GAS_URL,
+        "is_locked": False,
+        "auto_hide_whatsapp": False,
+        "auto_hide_keywords": ["whatsapp", "line"],
+        "geometry": "60x140+100+100",
+        "menus": {
+            "actions": ["Clients Called"],
+            "wins": ["Clients Booked"]
+        },
+        "categories": ["Unspecified"],
+        "bulk_upload": False,
+        "bulk_max_events": 100,
+        "bulk_max_bytes": 256 * 1024,
+        "http_pool_size": 4,
+        "http_workers": 4,
+        "http_connect_timeout": 5,
+        "http_read_timeout": 10,
+        "http_retries": 2,
+        "http_retry_posts": False,
+        "http_backoff": 0.5,
+        "event_flush_window": 1.0,
+        "breaker_failure_threshold": 3,
+        "backoff_base_seconds": 5,
+        "backoff_max_seconds": 300,
+        "storage_backend": "sqlite",
+        "stats_autosave_seconds": 5,
+        "store_lease_seconds": 120,
+        "upload_format": "json",
+        "upload_gzip": "auto",
+        "upload_aggregate": False,
+        "extra_gas_urls": [],
+        "endpoint_concurrency": 2,
+        "update_chunk_bytes": 1024 * 1024,
+        "telemetry_log": True,
+        "telemetry_interval_seconds": 60,
+        "telemetry_slow_ms": 100,
+        "metrics_port": 0,
+        "team_config_url": "",
+        "team_config_poll_seconds": 300,
+        "team_config_jitter_seconds": 60,
+        "update_check_jitter_seconds": 600
+    }
+
+
+def load_config():
+    defaults = default_config()
+
+    path = bundled_config_file()
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                defaults.update(json.load(f))
+        except Exception:
+            pass
+
+    user_config = {}
+    path = user_config_file()
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                user_config = json.load(f)
+        except Exception:
+            pass
+
+    final_config = defaults.copy()
+    final_config.update(user_config)
+
+    if "user_name" in user_config and "employees_name" not in user_config:
+        final_config["employees_name"] = user_config["user_name"]
+
+    if "menus" not in user_config:
+        final_config["menus"] = defaults["menus"]
+    if "categories" not in user_config:
+        final_config["categories"] = defaults["categories"]
+
+    # ค่าที่ทีมกำหนด (snapshot ล่าสุดบนดิสก์ ไม่รอเน็ต) ทับค่าของเครื่อง
+    if final_config.get("team_config_url"):
+        final_config.update(cached_team_values())
+
+    return final_config
+
+
+def _write_config(config):
+    with metrics.timer("disk_save", file="config"):
+        atomic_write_json(user_config_file(), config)
+
+
+_config_writer = WriteBehind(_write_config, delay=1.0, name="config-writer")
+
+
+def save_config(config):
+    try:
+        _config_writer.write_now(dict(config))
+    except Exception as e:
+        # Log error เล็กน้อยถ้า Save ไม่ได้ (ไม่ถึงกับ Crash)
+        metrics.error("Error saving config", detail=str(e))
+
+
+def save_config_later(config):
+    """Coalesce rapid saves (window drags, resizes) into one write about a second later."""
+    _config_writer.submit(dict(config))
+
+
+def flush_config():
+    _config_writer.flush()
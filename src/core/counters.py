@@ -0,0 +1,90 @@
+import threading
+from datetime import datetime
+
+# --- Running Totals ---
+# Authoritative in-memory counts for today while the app runs. Reading a
+# count never touches the disk; the day rolls over on first access after
+# midnight, and dirty snapshots are written by a background timer and on exit.
+
+
+class RunningCounters:
+    def __init__(self, stats=None, save=None, clock=datetime.now):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._save = save
+        self._dirty = False
+        self._stop = threading.Event()
+        self._thread = None
+        stats = stats or {}
+        self._date = stats.get("date") or self._today()
+        self._counts = dict(stats.get("counts", {}))
+        self._rollover()
+
+    def _today(self):
+        return self._clock().strftime("%Y-%m-%d")
+
+    def _rollover(self):
+        today_str = self._today()
+        if self._date != today_str:
+            self._date = today_str
+            self._counts = {}
+            self._dirty = True
+
+    @property
+    def date(self):
+        with self._lock:
+            self._rollover()
+            return self._date
+
+    def apply(self, item, delta):
+        """Add `delta` to today's count for `item` and return the new value."""
+        with self._lock:
+            self._rollover()
+            value = self._counts.get(item, 0) + delta
+            self._counts[item] = value
+            self._dirty = True
+            return value
+
+    def get(self, item):
+        with self._lock:
+            self._rollover()
+            return self._counts.get(item, 0)
+
+    def snapshot(self):
+        with self._lock:
+            self._rollover()
+            return {"date": self._date, "counts": dict(self._counts)}
+
+    # --- Persistence ---
+    def flush(self):
+        """Write a snapshot if anything changed since the last write."""
+        if self._save is None:
+            return False
+        with self._lock:
+            if not self._dirty:
+                return False
+            snapshot = {"date": self._date, "counts": dict(self._counts)}
+            self._dirty = False
+        try:
+            self._save(snapshot)
+        except Exception:
+            with self._lock:
+                self._dirty = True
+            return False
+        return True
+
+    def start_autosave(self, interval=5.0):
+        if self._save is None or self._thread is not None:
+            return self
+
+        def run():
+            while not self._stop.wait(interval):
+                self.flush()
+
+        self._thread = threading.Thread(target=run, name="counters-autosave", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        self.flush()
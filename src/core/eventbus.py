@@ -0,0 +1,129 @@
+import threading
+import time
+
+from core.telemetry import metrics
+
+# --- In-memory Event Bus ---
+# The UI thread only publishes into a ring buffer (no disk, no network).
+# A flusher thread waits for the coalescing window to pass, merges events
+# that share a key into one net delta and hands the result to
+# on_flush(events, done) in a single call.
+#
+# `done` is a set the callback fills with the sinks (queues) that stored
+# the window. If on_flush raises (database locked, disk full) the window is
+# kept as it is, together with its `done` set, and retried after the next
+# window: sinks that already stored it are skipped, and newer clicks are
+# never merged into it. Windows are retried oldest first, so nothing
+# counted in the UI is silently dropped or persisted twice.
+
+COALESCE_FIELDS = ("date", "employees_name", "works_type", "works_detail", "client_name", "events_category")
+
+
+class RingBuffer:
+    def __init__(self, capacity=1024):
+        self._slots = [None] * capacity
+        self._head = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def push(self, item):
+        if self._size == len(self._slots):
+            # ไม่ทิ้ง event: ขยาย buffer แทนการเขียนทับของเก่า
+            self._slots = self.drain() + [None] * len(self._slots)
+            self._head = 0
+            self._size = len(self._slots) // 2
+        self._slots[(self._head + self._size) % len(self._slots)] = item
+        self._size += 1
+
+    def drain(self):
+        items = []
+        for i in range(self._size):
+            idx = (self._head + i) % len(self._slots)
+            items.append(self._slots[idx])
+            self._slots[idx] = None
+        self._head = 0
+        self._size = 0
+        return items
+
+
+def coalesce(events, fields=COALESCE_FIELDS):
+    """Merge events with the same key into one event carrying the net "counts".
+
+    The first event of each key keeps its position and timestamp; keys whose
+    clicks cancel out (e.g. +1 then -1) are dropped.
+    """
+    merged = {}
+    for event in events:
+        key = tuple(event.get(f) for f in fields)
+        if key in merged:
+            merged[key]["counts"] += event.get("counts", 0)
+        else:
+            merged[key] = event.copy()
+    return [e for e in merged.values() if e.get("counts")]
+
+
+class EventBus:
+    def __init__(self, on_flush, window=1.0, capacity=1024):
+        self.on_flush = on_flush
+        self.window = window
+        self.capacity = capacity
+        self._buffer = RingBuffer(capacity)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._retry = []  # (events, done) ของ window ที่บันทึกไม่สำเร็จ เก่าสุดก่อน
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = None
+
+    def publish(self, event):
+        with self._lock:
+            self._buffer.push(event)
+        self._wake.set()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="event-bus", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait()
+            # รอให้ครบหน้าต่างเวลา เพื่อรวมการกดรัวๆ ให้เป็นครั้งเดียว
+            deadline = time.monotonic() + self.window
+            while not self._stopped:
+                with self._lock:
+                    if len(self._buffer) >= self.capacity:
+                        break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                time.sleep(min(remaining, 0.05))
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                events = self._buffer.drain()
+                self._wake.clear()
+            windows, self._retry = self._retry, []
+            if events:
+                windows.append((coalesce(events), set()))
+            for n, (merged, done) in enumerate(windows):
+                try:
+                    self.on_flush(merged, done)
+                except Exception as e:
+                    metrics.error("event flush failed, will retry", events=len(merged), detail=str(e))
+                    # window นี้และที่ตามมายังไม่ได้บันทึก (ครบทุก sink) เก็บไว้ลองใหม่ตามลำดับเดิม
+                    self._retry = windows[n:]
+                    self._wake.set()
+                    return
+
+    def stop(self, flush=True):
+        self._stopped = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.window + 1)
+        if flush:
+            self.flush()
@@ -0,0 +1,76 @@
+import hashlib
+import os
+import threading
+import time
+
+# --- Event IDs ---
+# ULID-style identifiers: 48-bit millisecond timestamp + 80 random bits,
+# written as 26 Crockford base32 characters. IDs sort by creation time as
+# plain strings, and IDs made within the same millisecond by one generator
+# are strictly increasing (the random part is incremented), so the endpoint
+# can deduplicate retries and keep rows in click order.
+
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_RANDOM_MAX = (1 << 80) - 1
+
+
+def _encode(value, length):
+    chars = []
+    for _ in range(length):
+        value, idx = divmod(value, 32)
+        chars.append(ALPHABET[idx])
+    return "".join(reversed(chars))
+
+
+def id_timestamp_ms(event_id):
+    """Milliseconds since the epoch at which `event_id` was generated."""
+    value = 0
+    for ch in event_id[:10]:
+        value = value * 32 + ALPHABET.index(ch)
+    return value
+
+
+class EventIdGenerator:
+    def __init__(self, clock=time.time, randbits=None):
+        self._clock = clock
+        self._randbits = randbits or (lambda: int.from_bytes(os.urandom(10), "big"))
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._last_rand = 0
+
+    def new(self):
+        ms = int(self._clock() * 1000)
+        with self._lock:
+            if ms <= self._last_ms:
+                # นาฬิกาเดินถอยหลังหรือยังอยู่ใน ms เดิม: ใช้เวลาเดิมแล้วบวก random ขึ้นไป 1
+                ms = self._last_ms
+                rand = self._last_rand + 1
+                if rand > _RANDOM_MAX:
+                    ms += 1
+                    rand = self._randbits()
+            else:
+                rand = self._randbits()
+            self._last_ms, self._last_rand = ms, rand
+        return _encode(ms, 10) + _encode(rand, 16)
+
+
+_generator = EventIdGenerator()
+
+
+def new_event_id():
+    return _generator.new()
+
+
+def merged_event_id(ids):
+    """ID for a row that merges several events (minute aggregation).
+
+    Derived from every member ID, so re-sending the same group yields the
+    same ID, while a group that gained or lost a click gets a new one and is
+    not dropped as a duplicate. Keeps the earliest member's timestamp part,
+    so merged IDs still sort by time.
+    """
+    ids = sorted(set(ids))
+    if len(ids) == 1:
+        return ids[0]
+    digest = hashlib.sha256("\n".join(ids).encode("utf-8")).digest()
+    return ids[0][:10] + _encode(int.from_bytes(digest[:10], "big"), 16)
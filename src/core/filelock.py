@@ -0,0 +1,74 @@
+import os
+import time
+
+# --- Cross-process File Lock ---
+# An advisory exclusive lock on a file: fcntl.flock on Linux/macOS,
+# msvcrt.locking on Windows. The OS drops the lock when the holding process
+# exits (even if it is killed), so a crashed instance never leaves a stale lock.
+
+
+class FileLock:
+    def __init__(self, path):
+        self.path = path
+        self._fh = None
+
+    @property
+    def locked(self):
+        return self._fh is not None
+
+    def acquire(self, blocking=True, timeout=None):
+        """Take the lock. Returns False if it is held elsewhere and we may not wait."""
+        if self._fh is not None:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            fh = open(self.path, "a+b")
+            try:
+                self._lock(fh)
+            except OSError:
+                fh.close()
+                if not blocking or (deadline is not None and time.monotonic() >= deadline):
+                    return False
+                time.sleep(0.05)
+                continue
+            self._fh = fh
+            return True
+
+    def release(self):
+        fh, self._fh = self._fh, None
+        if fh is None:
+            return
+        try:
+            self._unlock(fh)
+        finally:
+            fh.close()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    if os.name == "nt":
+        @staticmethod
+        def _lock(fh):
+            import msvcrt
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+
+        @staticmethod
+        def _unlock(fh):
+            import msvcrt
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        @staticmethod
+        def _lock(fh):
+            import fcntl
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+        @staticmethod
+        def _unlock(fh):
+            import fcntl
+            fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
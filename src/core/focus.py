@@ -0,0 +1,165 @@
+import os
+import sys
+import threading
+
+# --- Foreground Window Watching ---
+# A watcher calls on_change(hwnd, pid, title) whenever the foreground window
+# (or its title) changes. The Windows backend is event driven through
+# SetWinEventHook, so nothing runs while the user stays in one window.
+# FakeFocusWatcher lets tests and Linux runs script focus changes by hand.
+
+DEFAULT_KEYWORDS = ("whatsapp", "line")
+
+
+class FocusMatcher:
+    """Decides whether the counter should be visible for a given foreground window.
+
+    Decisions are cached per (hwnd, title) so a window is lowercased and
+    searched only once, and our own process is recognised by pid alone.
+    """
+
+    def __init__(self, keywords=DEFAULT_KEYWORDS, own_pid=None, max_cache=256):
+        self.keywords = tuple(k.lower() for k in keywords)
+        self.own_pid = os.getpid() if own_pid is None else own_pid
+        self.max_cache = max_cache
+        self._cache = {}
+
+    def should_show(self, hwnd, pid, title):
+        if pid == self.own_pid:
+            return True
+        key = (hwnd, title)
+        decision = self._cache.get(key)
+        if decision is None:
+            lowered = (title or "").lower()
+            decision = any(k in lowered for k in self.keywords)
+            if len(self._cache) >= self.max_cache:
+                self._cache.clear()
+            self._cache[key] = decision
+        return decision
+
+
+class FocusWatcher:
+    def __init__(self, on_change):
+        self.on_change = on_change
+
+    def start(self):
+        return self
+
+    def stop(self):
+        pass
+
+    def _emit(self, hwnd, pid, title):
+        try:
+            self.on_change(hwnd, pid, title)
+        except Exception:
+            pass
+
+
+class FakeFocusWatcher(FocusWatcher):
+    """Scriptable backend: call focus() to simulate the user switching windows."""
+
+    def __init__(self, on_change):
+        super().__init__(on_change)
+        self.running = False
+
+    def start(self):
+        self.running = True
+        return self
+
+    def stop(self):
+        self.running = False
+
+    def focus(self, hwnd, pid, title):
+        if self.running:
+            self._emit(hwnd, pid, title)
+
+
+class WinEventFocusWatcher(FocusWatcher):
+    """Foreground-change hook (EVENT_SYSTEM_FOREGROUND + title changes) on its own message loop thread."""
+
+    EVENT_SYSTEM_FOREGROUND = 0x0003
+    EVENT_OBJECT_NAMECHANGE = 0x800C
+    WINEVENT_OUTOFCONTEXT = 0x0000
+    OBJID_WINDOW = 0
+    WM_QUIT = 0x0012
+
+    def __init__(self, on_change):
+        super().__init__(on_change)
+        self._thread = None
+        self._thread_id = None
+        self._ready = threading.Event()
+        self._foreground = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="focus-watcher", daemon=True)
+        self._thread.start()
+        self._ready.wait(2)
+        return self
+
+    def stop(self):
+        import ctypes
+        if self._thread_id:
+            ctypes.windll.user32.PostThreadMessageW(self._thread_id, self.WM_QUIT, 0, 0)
+
+    def _describe(self, user32, hwnd):
+        import ctypes
+        from ctypes import wintypes
+        length = user32.GetWindowTextLengthW(hwnd)
+        buf = ctypes.create_unicode_buffer(length + 1)
+        user32.GetWindowTextW(hwnd, buf, length + 1)
+        pid = wintypes.DWORD()
+        user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+        return pid.value, buf.value
+
+    def _run(self):
+        import ctypes
+        from ctypes import wintypes
+
+        user32 = ctypes.windll.user32
+        self._thread_id = ctypes.windll.kernel32.GetCurrentThreadId()
+
+        WinEventProc = ctypes.WINFUNCTYPE(None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+                                          wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD)
+
+        def callback(hook, event, hwnd, id_object, id_child, thread, time_ms):
+            if not hwnd:
+                return
+            if event == self.EVENT_SYSTEM_FOREGROUND:
+                self._foreground = hwnd
+            elif hwnd != self._foreground or id_object != self.OBJID_WINDOW:
+                # title เปลี่ยนของหน้าต่างอื่นที่ไม่ได้อยู่ด้านหน้า ไม่ต้องสนใจ
+                return
+            pid, title = self._describe(user32, hwnd)
+            self._emit(hwnd, pid, title)
+
+        # ต้องเก็บ reference ไว้ ไม่งั้น callback โดน garbage collect
+        self._proc = WinEventProc(callback)
+        hooks = [
+            user32.SetWinEventHook(self.EVENT_SYSTEM_FOREGROUND, self.EVENT_SYSTEM_FOREGROUND, 0,
+                                   self._proc, 0, 0, self.WINEVENT_OUTOFCONTEXT),
+            user32.SetWinEventHook(self.EVENT_OBJECT_NAMECHANGE, self.EVENT_OBJECT_NAMECHANGE, 0,
+                                   self._proc, 0, 0, self.WINEVENT_OUTOFCONTEXT),
+        ]
+        self._ready.set()
+
+        # สถานะเริ่มต้น: หน้าต่างที่อยู่ด้านหน้าตอนนี้
+        hwnd = user32.GetForegroundWindow()
+        if hwnd:
+            self._foreground = hwnd
+            pid, title = self._describe(user32, hwnd)
+            self._emit(hwnd, pid, title)
+
+        msg = wintypes.MSG()
+        while user32.GetMessageW(ctypes.byref(msg), 0, 0, 0) > 0:
+            user32.TranslateMessage(ctypes.byref(msg))
+            user32.DispatchMessageW(ctypes.byref(msg))
+        for hook in hooks:
+            if hook:
+                user32.UnhookWinEvent(hook)
+
+
+def create_focus_watcher(on_change):
+    """The event-driven watcher on Windows; a (silent) fake elsewhere."""
+    if sys.platform == "win32":
+        return WinEventFocusWatcher(on_change)
+    return FakeFocusWatcher(on_change)
@@ -0,0 +1,283 @@
+import json
+import os
+import threading
+
+from core.filelock import FileLock
+from core.persist import atomic_write_bytes
+from core.record import EventRecord, to_json
+
+# --- Append-only Segmented Journal ---
+# Each record is one JSON line. Records are numbered by a global sequence
+# number; a segment file is named after the sequence number of its first
+# record, so only the active (last) segment ever has to be scanned.
+# The checkpoint file holds the first sequence number that is NOT yet
+# acknowledged; everything below it may be reclaimed.
+#
+# Records are read back as compact EventRecords (core.record); iter_pending()
+# streams the whole backlog without holding it in memory.
+#
+# A journal directory belongs to one process at a time (LOCK file); a
+# second instance gets JournalLocked and opens its own shard instead
+# (see core.offline_queue.open_journal_shard).
+
+SEGMENT_SUFFIX = ".log"
+CHECKPOINT_FILE = "checkpoint"
+LOCK_FILE = "LOCK"
+
+
+class JournalLocked(Exception):
+    """The journal directory is in use by another process."""
+
+
+def _segment_name(base_seq):
+    return f"{base_seq:020d}{SEGMENT_SUFFIX}"
+
+
+def _decode(line):
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return None
+    return EventRecord.from_dict(data) if isinstance(data, dict) else None
+
+
+class Journal:
+    def __init__(self, directory, segment_max_bytes=1024 * 1024, fsync=True):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._appended = threading.Event()
+        os.makedirs(directory, exist_ok=True)
+        self._process_lock = FileLock(os.path.join(directory, LOCK_FILE))
+        if not self._process_lock.acquire(blocking=False):
+            raise JournalLocked(directory)
+
+        self._segments = self._list_segments()
+        self._committed = self._read_checkpoint()
+        self._recover()
+
+        # Read cursor: (sequence, segment base, byte position) of the first
+        # unacknowledged record.
+        self._cursor = self._locate(self._committed)
+        # End positions of records returned by the last peek(), so ack() is O(1).
+        self._peeked = {}
+
+    # --- Recovery ---
+    def _list_segments(self):
+        bases = []
+        for name in os.listdir(self.directory):
+            if name.endswith(SEGMENT_SUFFIX):
+                try:
+                    bases.append(int(name[:-len(SEGMENT_SUFFIX)]))
+                except ValueError:
+                    pass
+        bases.sort()
+        return bases
+
+    def _segment_path(self, base_seq):
+        return os.path.join(self.directory, _segment_name(base_seq))
+
+    def _read_checkpoint(self):
+        try:
+            with open(os.path.join(self.directory, CHECKPOINT_FILE), "rb") as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _recover(self):
+        if not self._segments:
+            self._segments = [self._committed]
+            open(self._segment_path(self._committed), "ab").close()
+
+        # ตัดบรรทัดสุดท้ายที่เขียนไม่จบ (เครื่องดับระหว่างเขียน) ทิ้ง
+        active_base = self._segments[-1]
+        active_path = self._segment_path(active_base)
+        with open(active_path, "rb") as f:
+            data = f.read()
+        good_len = data.rfind(b"\n") + 1
+        if good_len != len(data):
+            with open(active_path, "r+b") as f:
+                f.truncate(good_len)
+                f.flush()
+                os.fsync(f.fileno())
+
+        self._next_seq = active_base + data.count(b"\n", 0, good_len)
+        self._active_size = good_len
+        self._committed = min(max(self._committed, self._segments[0]), self._next_seq)
+        self._fh = open(active_path, "ab")
+
+    def _locate(self, seq):
+        """Find the byte position of record `seq` by scanning its segment."""
+        base = self._segments[0]
+        for b in self._segments:
+            if b <= seq:
+                base = b
+        pos = 0
+        current = base
+        if current < seq:
+            with open(self._segment_path(base), "rb") as f:
+                while current < seq:
+                    line = f.readline()
+                    if not line:
+                        break
+                    current += 1
+                pos = f.tell()
+        return (current, base, pos)
+
+    # --- Writer ---
+    def append(self, record):
+        return self.append_many([record])[0]
+
+    def append_many(self, records):
+        """Append several records with a single flush/fsync. Returns their sequence numbers."""
+        lines = [json.dumps(r, ensure_ascii=False, separators=(",", ":"), default=to_json).encode("utf-8") + b"\n"
+                 for r in records]
+        if not lines:
+            return []
+        seqs = []
+        with self._lock:
+            for line in lines:
+                if self._active_size and self._active_size + len(line) > self.segment_max_bytes:
+                    self._fh.flush()
+                    if self.fsync:
+                        os.fsync(self._fh.fileno())
+                    self._rotate()
+                self._fh.write(line)
+                self._active_size += len(line)
+                seqs.append(self._next_seq)
+                self._next_seq += 1
+            self._fh.flush()
+            if self.fsync:
+                os.fsync(self._fh.fileno())
+        self._appended.set()
+        return seqs
+
+    def _rotate(self):
+        self._fh.close()
+        self._segments.append(self._next_seq)
+        self._fh = open(self._segment_path(self._next_seq), "ab")
+        self._active_size = 0
+
+    # --- Reader ---
+    def peek(self, max_records=1):
+        """Return up to `max_records` unacknowledged (seq, record) pairs, oldest first.
+
+        A line that cannot be decoded is returned with record None so the
+        caller can acknowledge (skip) it instead of stalling on it forever.
+        """
+        with self._lock:
+            self._peeked = {}
+            result = []
+            seq, base, pos = self._cursor
+            while len(result) < max_records and seq < self._next_seq:
+                idx = self._segments.index(base)
+                with open(self._segment_path(base), "rb") as f:
+                    f.seek(pos)
+                    while len(result) < max_records and seq < self._next_seq:
+                        line = f.readline()
+                        if not line:
+                            break
+                        record = _decode(line)
+                        pos = f.tell()
+                        result.append((seq, record))
+                        seq += 1
+                        self._peeked[seq - 1] = (seq, base, pos)
+                if len(result) < max_records and seq < self._next_seq and idx + 1 < len(self._segments):
+                    base = self._segments[idx + 1]
+                    pos = 0
+            return result
+
+    def iter_pending(self):
+        """Yield every unacknowledged (seq, record) lazily, oldest first.
+
+        Reads segment by segment from the current cursor and does not touch
+        peek()/ack() state, so only the record being yielded is in memory.
+        """
+        with self._lock:
+            seq, base, pos = self._cursor
+            end = self._next_seq
+            segments = [b for b in self._segments if b >= base]
+        for base in segments:
+            try:
+                with open(self._segment_path(base), "rb") as f:
+                    f.seek(pos)
+                    for line in f:
+                        if seq >= end:
+                            return
+                        yield seq, _decode(line)
+                        seq += 1
+            except OSError:
+                return  # segment ถูก compact ไปแล้วระหว่างอ่าน
+            pos = 0
+
+    def ack(self, seq):
+        """Acknowledge every record up to and including `seq`."""
+        with self._lock:
+            if seq < self._committed:
+                return
+            seq = min(seq, self._next_seq - 1)
+            cursor = self._peeked.get(seq)
+            if cursor is None:
+                cursor = self._locate(seq + 1)
+            self._cursor = cursor
+            self._committed = seq + 1
+            self._peeked = {k: v for k, v in self._peeked.items() if k > seq}
+            atomic_write_bytes(os.path.join(self.directory, CHECKPOINT_FILE),
+                               str(self._committed).encode("ascii"), fsync=self.fsync)
+
+    def oldest_pending(self):
+        """The oldest unacknowledged record, or None. Does not disturb peek()/ack() state."""
+        with self._lock:
+            seq, base, pos = self._cursor
+            if seq >= self._next_seq:
+                return None
+            with open(self._segment_path(base), "rb") as f:
+                f.seek(pos)
+                line = f.readline()
+            if not line and base != self._segments[-1]:
+                # cursor อยู่ท้าย segment พอดี ระเบียนถัดไปอยู่ต้น segment ถัดไป
+                with open(self._segment_path(self._segments[self._segments.index(base) + 1]), "rb") as f:
+                    line = f.readline()
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
+
+    def pending_count(self):
+        with self._lock:
+            return self._next_seq - self._committed
+
+    def wait(self, timeout=None):
+        """Block until at least one record is pending, without touching the disk.
+
+        Returns True if records are pending, False on timeout.
+        """
+        self._appended.clear()
+        if self.pending_count() > 0:
+            return True
+        self._appended.wait(timeout)
+        return self.pending_count() > 0
+
+    # --- Reclaim ---
+    def compact(self):
+        """Delete segments whose records are all acknowledged. Returns how many were removed."""
+        removed = 0
+        with self._lock:
+            while len(self._segments) > 1 and self._segments[1] <= self._committed:
+                base = self._segments.pop(0)
+                if self._cursor[1] == base:
+                    # Cursor sat at the end of this segment == start of the next one.
+                    self._cursor = (self._cursor[0], self._segments[0], 0)
+                self._peeked = {}
+                try:
+                    os.remove(self._segment_path(base))
+                except OSError:
+                    pass
+                removed += 1
+        return removed
+
+    def close(self):
+        with self._lock:
+            self._fh.close()
+            self._process_lock.release()
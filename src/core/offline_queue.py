@@ -0,0 +1,162 @@
+import json
+import os
+import shutil
+import time
+
+from core.journal import Journal, JournalLocked
+from core.paths import data_path, get_data_dir
+from core.persist import quarantine_file
+from core.record import iter_json_array, to_json
+from core.telemetry import metrics
+
+# --- Offline Queue Management ---
+# Several copies of the app may run on one machine. Each journal-backed
+# queue is sharded per process: the first instance owns "queue", the next
+# "queue.1" and so on. On start an instance pulls the pending records of
+# any shard whose owner has exited into its own shard, so nothing is left
+# behind and no record is ever sent by two processes.
+
+
+def _shard_dir(name, shard):
+    return data_path(name if shard == 0 else f"{name}.{shard}")
+
+
+def open_journal_shard(name):
+    shard = 0
+    while True:
+        try:
+            journal = Journal(_shard_dir(name, shard))
+            break
+        except JournalLocked:
+            shard += 1
+    adopt_orphan_shards(journal, name)
+    return journal
+
+
+def adopt_orphan_shards(journal, name):
+    """Move pending records from shards no running process owns into `journal`."""
+    adopted = 0
+    for entry in sorted(os.listdir(get_data_dir())):
+        if entry != name and not (entry.startswith(name + ".") and entry[len(name) + 1:].isdigit()):
+            continue
+        path = data_path(entry)
+        if not os.path.isdir(path) or os.path.abspath(path) == os.path.abspath(journal.directory):
+            continue
+        try:
+            orphan = Journal(path)
+        except JournalLocked:
+            continue
+        while True:
+            batch = orphan.peek(500)
+            if not batch:
+                break
+            journal.append_many([record for _, record in batch if record is not None])
+            orphan.ack(batch[-1][0])
+            adopted += len(batch)
+        orphan.close()
+        if entry != name:
+            shutil.rmtree(path, ignore_errors=True)
+    return adopted
+
+
+def open_queue():
+    journal = open_journal_shard("queue")
+    migrate_legacy_queue(journal, data_path("queue.json"))
+    return journal
+
+
+def open_outbox(name):
+    """Journal holding events for one extra endpoint (see core.syncengine)."""
+    return open_journal_shard(name)
+
+
+def open_backend(config):
+    """The event queue selected by config["storage_backend"]: "sqlite" (default) or "journal"."""
+    if config.get("storage_backend", "sqlite") == "journal":
+        return open_queue()
+    from core.store import LEASE_SECONDS, open_store
+    return open_store(lease_seconds=config.get("store_lease_seconds", LEASE_SECONDS))
+
+
+def open_counters(queue, autosave_interval=5.0):
+    """Today's running counters, loaded once from the backend.
+
+    With the SQLite store every event is already durable, so only the
+    journal backend writes stats.json snapshots.
+    """
+    from core.counters import RunningCounters
+    if getattr(queue, "records_history", False):
+        from core.store import today_stats
+        return RunningCounters(today_stats(queue))
+    from core.stats import load_stats, save_stats
+    return RunningCounters(load_stats(), save=save_stats).start_autosave(autosave_interval)
+
+
+def migrate_legacy_queue(journal, legacy_file):
+    # ย้ายคิวจาก queue.json (เวอร์ชันเก่า) เข้า journal แล้วลบไฟล์เดิม
+    import_legacy_queue(legacy_file, journal.append_many)
+
+
+def import_legacy_queue(legacy_file, append_many, batch_size=500):
+    """Stream the events of an old queue.json into append_many(batch).
+
+    The file is removed only after every event was imported. If it stops
+    parsing part way, the events read before the error are still imported
+    and the file is renamed to queue.json.corrupt. If append_many fails the
+    file is left in place for the next start. Returns the number imported.
+    """
+    if not os.path.exists(legacy_file):
+        return 0
+    imported = 0
+    batch = []
+    try:
+        # อ่านทีละระเบียน ไม่โหลดทั้งไฟล์เข้าหน่วยความจำ
+        with open(legacy_file, "r", encoding="utf-8") as f:
+            records = iter_json_array(f)
+            while True:
+                try:
+                    record = next(records, None)
+                except ValueError as e:
+                    # ไฟล์ขาดกลางทาง: เก็บส่วนที่อ่านได้แล้ว ย้ายไฟล์ไปเป็น .corrupt
+                    if batch:
+                        append_many(batch)
+                        imported += len(batch)
+                    quarantine_file(legacy_file, e)
+                    return imported
+                if record is None:
+                    break
+                batch.append(record)
+                if len(batch) >= batch_size:
+                    append_many(batch)
+                    imported += len(batch)
+                    batch = []
+        if batch:
+            append_many(batch)
+            imported += len(batch)
+    except Exception as e:
+        metrics.error("legacy queue import failed, will retry", file=os.path.basename(legacy_file),
+                      detail=str(e))
+        return imported
+    try:
+        os.remove(legacy_file)
+    except OSError:
+        pass
+    return imported
+
+
+def write_dead_letter(data):
+    # event ที่ server ปฏิเสธ เก็บไว้ดูทีหลัง
+    try:
+        with open(data_path("dead_letter.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(data, ensure_ascii=False, default=to_json) + "\n")
+    except Exception:
+        pass
+
+
+def compactor_thread(queue, interval=60):
+    while True:
+        time.sleep(interval)
+        try:
+            queue.compact()
+        except Exception:
+            pass
@@ -0,0 +1,180 @@
+import hashlib
+import lzma
+import struct
+import zlib
+
+# --- Binary Delta Patches ---
+# rsync-style block diff between two builds of the exe. The source is cut
+# into fixed blocks indexed by Adler-32; the target is scanned with a
+# rolling Adler-32 and every verified match is extended as far as it goes.
+#
+# Patch file ("CCP1"):
+#   magic b"CCP1" | source sha256 (32 bytes) | target sha256 (32) | target size (u64)
+#   lzma( ops... )  where an op is
+#     b"C" offset(u64) length(u64)   copy from the source file
+#     b"I" length(u64) data          insert literal bytes
+#
+# Both hashes are checked on apply, so a patch can never be applied to the
+# wrong exe or produce anything other than the exact target build.
+
+MAGIC = b"CCP1"
+HEADER = struct.Struct(">4s32s32sQ")
+DEFAULT_BLOCK_SIZE = 256
+_MOD = 65521
+
+
+class PatchError(Exception):
+    pass
+
+
+def _adler(data):
+    value = zlib.adler32(data)
+    return value & 0xFFFF, value >> 16
+
+
+def _index_blocks(source, block):
+    index = {}
+    for offset in range(0, len(source) - block + 1, block):
+        a, b = _adler(source[offset:offset + block])
+        index.setdefault((b << 16) | a, []).append(offset)
+    return index
+
+
+def _match_length(source, s, target, t, limit):
+    # เทียบทีละก้อนใหญ่ก่อน แล้วค่อยไล่ทีละ byte ตอนท้าย
+    n = 0
+    step = 4096
+    while n < limit:
+        size = min(step, limit - n)
+        if source[s + n:s + n + size] == target[t + n:t + n + size]:
+            n += size
+            continue
+        while n < limit and source[s + n] == target[t + n]:
+            n += 1
+        break
+    return n
+
+
+def diff_ops(source, target, block=DEFAULT_BLOCK_SIZE):
+    """Yield ("C", offset, length) / ("I", data) ops that rebuild target from source."""
+    index = _index_blocks(source, block)
+    n = len(target)
+    literal_start = 0
+    i = 0
+    a = b = None
+    while i + block <= n:
+        if a is None:
+            a, b = _adler(target[i:i + block])
+        match = None
+        for offset in index.get((b << 16) | a, ()):
+            if source[offset:offset + block] == target[i:i + block]:
+                match = offset
+                break
+        if match is not None:
+            if literal_start < i:
+                yield ("I", target[literal_start:i])
+            length = block + _match_length(source, match + block, target, i + block,
+                                           min(len(source) - match, n - i) - block)
+            yield ("C", match, length)
+            i += length
+            literal_start = i
+            a = b = None
+            continue
+        # rolling Adler-32: เลื่อนหน้าต่างไป 1 byte
+        out_byte = target[i]
+        in_byte = target[i + block] if i + block < n else None
+        if in_byte is None:
+            break
+        a = (a - out_byte + in_byte) % _MOD
+        b = (b - block * out_byte + a - 1) % _MOD
+        i += 1
+    if literal_start < n:
+        yield ("I", target[literal_start:])
+
+
+def _merge_ops(ops):
+    # รวม copy ที่ต่อกันพอดีให้เป็นชิ้นเดียว
+    pending = None
+    for op in ops:
+        if pending and pending[0] == "C" and op[0] == "C" and pending[1] + pending[2] == op[1]:
+            pending = ("C", pending[1], pending[2] + op[2])
+            continue
+        if pending:
+            yield pending
+        pending = op
+    if pending:
+        yield pending
+
+
+def make_patch(source, target, block=DEFAULT_BLOCK_SIZE):
+    """Return the patch bytes that turn `source` (bytes) into `target` (bytes)."""
+    body = bytearray()
+    for op in _merge_ops(diff_ops(source, target, block)):
+        if op[0] == "C":
+            body += b"C" + struct.pack(">QQ", op[1], op[2])
+        else:
+            body += b"I" + struct.pack(">Q", len(op[1])) + op[1]
+    header = HEADER.pack(MAGIC, hashlib.sha256(source).digest(), hashlib.sha256(target).digest(),
+                         len(target))
+    return header + lzma.compress(bytes(body), preset=6)
+
+
+def read_header(patch):
+    if len(patch) < HEADER.size:
+        raise PatchError("Patch file is truncated")
+    magic, source_sha, target_sha, target_size = HEADER.unpack_from(patch)
+    if magic != MAGIC:
+        raise PatchError("Not a ClickCounter patch file")
+    return source_sha.hex(), target_sha.hex(), target_size
+
+
+def apply_patch(source, patch):
+    """Rebuild the target bytes; raises PatchError if either hash does not match."""
+    source_sha, target_sha, target_size = read_header(patch)
+    if hashlib.sha256(source).hexdigest() != source_sha:
+        raise PatchError("Patch does not apply to this version")
+    try:
+        body = lzma.decompress(patch[HEADER.size:])
+    except lzma.LZMAError as e:
+        raise PatchError(f"Corrupt patch body: {e}")
+
+    out = bytearray()
+    pos = 0
+    while pos < len(body):
+        kind = body[pos:pos + 1]
+        if kind == b"C":
+            offset, length = struct.unpack_from(">QQ", body, pos + 1)
+            out += source[offset:offset + length]
+            pos += 17
+        elif kind == b"I":
+            (length,) = struct.unpack_from(">Q", body, pos + 1)
+            out += body[pos + 9:pos + 9 + length]
+            pos += 9 + length
+        else:
+            raise PatchError("Corrupt patch body: unknown op")
+
+    if len(out) != target_size or hashlib.sha256(out).hexdigest() != target_sha:
+        raise PatchError("Patched file does not match the target build")
+    return bytes(out)
+
+
+def find_chain(patches, current, latest):
+    """Shortest list of manifest patch entries leading from `current` to `latest`, or None."""
+    by_source = {}
+    for entry in patches or ():
+        by_source.setdefault(entry.get("from"), []).append(entry)
+    paths = {current: []}
+    frontier = [current]
+    while frontier:
+        next_frontier = []
+        for version in frontier:
+            for entry in by_source.get(version, ()):
+                to = entry.get("to")
+                if to in paths:
+                    continue
+                paths[to] = paths[version] + [entry]
+                if to == latest:
+                    return paths[to]
+                next_frontier.append(to)
+        frontier = next_frontier
+    return None
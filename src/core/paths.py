@@ -0,0 +1,46 @@
+import os
+import sys
+
+# --- Path Management ---
+# Nothing here touches the disk at import time. The data directory defaults
+# to %LOCALAPPDATA%\<app_name> (or ~/.local/share/<app_name> off Windows)
+# and can be injected with set_data_dir() or the CLICKCOUNTER_DATA_DIR
+# environment variable, e.g. for a headless sync worker or a test.
+
+DATA_DIR_ENV = "CLICKCOUNTER_DATA_DIR"
+
+_data_dir = None
+
+
+def resource_path(relative_path):
+    try:
+        base_path = sys._MEIPASS
+    except Exception:
+        base_path = os.path.abspath(".")
+    return os.path.join(base_path, relative_path)
+
+
+def default_data_dir(app_name):
+    base = os.getenv("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(base, app_name)
+
+
+def set_data_dir(path):
+    global _data_dir
+    try:
+        os.makedirs(path, exist_ok=True)
+    except OSError:
+        pass
+    _data_dir = path
+    return path
+
+
+def get_data_dir():
+    if _data_dir is None:
+        from core.config import bootstrap_info
+        set_data_dir(os.getenv(DATA_DIR_ENV) or default_data_dir(bootstrap_info()["app_name"]))
+    return _data_dir
+
+
+def data_path(filename):
+    return os.path.join(get_data_dir(), filename)
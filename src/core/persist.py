@@ -0,0 +1,128 @@
+import json
+import os
+import threading
+import time
+
+from core.telemetry import metrics
+
+# --- Crash-safe File Writes ---
+# Small state files (config.json, stats.json, the journal checkpoint) are
+# never rewritten in place: the new content goes to a temp file in the same
+# directory, is fsync'ed, and then renamed over the old file. A crash or
+# power cut leaves either the old or the new file, never a truncated one.
+#
+# WriteBehind coalesces bursts of saves (e.g. geometry on every mouse
+# release) into one write after a short delay. A failed write is logged
+# and the value stays pending, retried with a growing delay (up to a
+# minute) unless a newer value replaces it first.
+#
+# A state file that can no longer be parsed is not deleted or overwritten:
+# quarantine_file() renames it to <name>.corrupt for inspection.
+
+
+def atomic_write_bytes(path, data, fsync=True):
+    # ชื่อไฟล์ชั่วคราวมี pid กันสอง process เขียนทับ .tmp ของกันและกัน
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    if fsync and os.name == "posix":
+        # rename จะถาวรก็ต่อเมื่อ directory ถูก fsync ด้วย (Windows ไม่มีแนวคิดนี้)
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def quarantine_file(path, error):
+    """Rename an unreadable file to <name>.corrupt and log it."""
+    try:
+        os.replace(path, path + ".corrupt")
+    except OSError:
+        pass
+    metrics.error("unreadable file moved aside", file=os.path.basename(path), detail=str(error))
+
+
+def dumps_compact(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def atomic_write_json(path, obj, fsync=True):
+    atomic_write_bytes(path, dumps_compact(obj), fsync=fsync)
+
+
+class WriteBehind:
+    """Runs write(value) at most once per `delay` seconds with the latest submitted value."""
+
+    def __init__(self, write, delay=0.5, name="write-behind"):
+        self._write = write
+        self.delay = delay
+        self.name = name
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._pending = None
+        self._has_pending = False
+        self._thread = None
+        self.writes = 0
+        self.failures = 0  # ครั้งที่เขียนไม่สำเร็จติดกัน
+
+    def submit(self, value):
+        with self._cond:
+            self._pending = value
+            self._has_pending = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _take(self):
+        with self._cond:
+            if not self._has_pending:
+                return False, None
+            value, self._pending, self._has_pending = self._pending, None, False
+            return True, value
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._has_pending:
+                    self._cond.wait()
+            # รอให้ save ที่ตามมาติดๆ มารวมเป็นครั้งเดียว (เขียนพลาดอยู่ก็รอนานขึ้นก่อนลองใหม่)
+            time.sleep(min(self.delay * 2 ** self.failures, 60.0) if self.failures else self.delay)
+            self.flush()
+
+    def flush(self):
+        """Write the pending value (if any) now, on the calling thread."""
+        with self._write_lock:
+            has_value, value = self._take()
+            if has_value:
+                try:
+                    self._write(value)
+                    self.writes += 1
+                    self.failures = 0
+                except Exception as e:
+                    self.failures += 1
+                    metrics.error("Deferred write failed, will retry", writer=self.name, detail=str(e))
+                    with self._cond:
+                        # ยังไม่มีค่าใหม่มาแทน: เก็บค่าเดิมไว้เขียนรอบหน้า
+                        if not self._has_pending:
+                            self._pending, self._has_pending = value, True
+        return has_value
+
+    def write_now(self, value):
+        """Write `value` immediately; anything still pending is superseded."""
+        with self._write_lock:
+            self._take()
+            self._write(value)
+            self.writes += 1
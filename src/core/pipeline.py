@@ -0,0 +1,86 @@
+from datetime import datetime
+
+from core.eventbus import EventBus
+from core.eventid import new_event_id
+from core.record import EventRecord
+from core.telemetry import metrics
+
+# --- Click Logging Pipeline ---
+# Everything log_data used to do, minus the UI: bump today's running count,
+# publish the event, then persist it on flush and let the sync engine
+# (core.syncengine) deliver it to every configured endpoint.
+# ClickCounterApp and the headless benchmark drive the same object.
+
+
+class ClickPipeline:
+    def __init__(self, config, counters, queue, engine, clock=datetime.now, rollup=None):
+        self.config = config
+        self.counters = counters
+        self.queue = queue
+        self.engine = engine
+        self.clock = clock
+        self.rollup = rollup
+        self.bus = EventBus(self.flush_events, window=config.get("event_flush_window", 1.0))
+
+    def start(self):
+        self.bus.start()
+        return self
+
+    def log(self, menu, action, count_val, client_name="", category=""):
+        """Called on the UI thread: memory only, never disk or network."""
+        self.counters.apply(action, count_val)
+
+        now = self.clock()
+        data = EventRecord(
+            date=now.strftime("%Y-%m-%d"),
+            timestamp=now.strftime("%H:%M:%S"),
+            employees_name=self.config.get("employees_name", "Unknown"),
+            works_type=menu,
+            works_detail=action,
+            counts=count_val,
+            client_name=client_name,
+            events_category=category,
+            # ID คงที่ตลอดการส่งซ้ำ ให้ปลายทางตัดแถวซ้ำได้
+            event_id=new_event_id(),
+        )
+        self.bus.publish(data)
+        if self.rollup is not None:
+            self.rollup.add(now, menu, action, count_val)
+        return data
+
+    @metrics.timed("persist_events")
+    def flush_events(self, events, done):
+        # เรียกจาก thread ของ event bus: บันทึกลงคิวก่อนเสมอ (outbox) แล้วปลุก sync engine ให้ส่ง
+        # stats ถูกเขียนโดย counters เอง
+        # done = คิวที่บันทึก window นี้สำเร็จแล้วในรอบก่อน (ตอน retry ไม่เขียนซ้ำ)
+        try:
+            if self.queue not in done:
+                if getattr(self.queue, "records_history", False):
+                    # SQLite store: บันทึกครั้งเดียวพร้อมสถานะการส่ง (เป็นทั้ง stats และคิว)
+                    self.queue.append_many(events, pending=bool(self.config.get("gas_url")))
+                elif self.config.get("gas_url"):
+                    self.queue.append_many(events)
+                done.add(self.queue)
+            for channel in self.engine.channel_list():
+                if channel.queue is not self.queue and channel.queue not in done:
+                    channel.queue.append_many(events)
+                    done.add(channel.queue)
+        finally:
+            # sink ที่บันทึกสำเร็จแล้วส่งต่อได้เลย แม้ sink อื่นจะล้ม
+            self.engine.notify()
+        if self.rollup is not None:
+            self.rollup.save_later()
+
+    def close(self):
+        self.bus.stop(flush=True)
+        self.engine.stop()
+        self.counters.close()
+        if self.rollup is not None:
+            self.rollup.flush()
+        # ปล่อย lock/lease ให้ instance อื่นส่งต่อได้ทันที
+        queues = [self.queue] + [c.queue for c in self.engine.channel_list() if c.queue is not self.queue]
+        for queue in queues:
+            try:
+                queue.close()
+            except Exception:
+                pass
@@ -0,0 +1,180 @@
+import json
+import sys
+
+# --- Compact Event Record ---
+# The in-memory form of one click event. A decoded dict of the eight fields
+# costs ~1.3 KB with its own copy of every string; EventRecord keeps the
+# fields in __slots__ and interns the strings that repeat across events
+# (date, employee, menu, item, client, category), so a large batch or
+# backlog shares one copy of each and costs ~250 bytes per event
+# (tools/bench_memory.py). It reads like a dict
+# (get / [] / items), so the uploader and codec take either form, and
+# to_json() is the json.dumps `default=` hook at the disk/wire boundary.
+
+# FIELDS / ID_FIELD are the one definition of the event columns; the store,
+# the codec and the ingest server import them from here.
+FIELDS = ("date", "timestamp", "employees_name", "works_type", "works_detail",
+          "counts", "client_name", "events_category")
+INTERNED = ("date", "employees_name", "works_type", "works_detail", "client_name", "events_category")
+ID_FIELD = "event_id"
+_ALL = FIELDS + (ID_FIELD,)
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+class EventRecord:
+    __slots__ = _ALL + ("extra",)
+
+    def __init__(self, date="", timestamp="", employees_name="", works_type="", works_detail="",
+                 counts=0, client_name="", events_category="", event_id=None, extra=None):
+        self.date = _intern(date)
+        self.timestamp = timestamp
+        self.employees_name = _intern(employees_name)
+        self.works_type = _intern(works_type)
+        self.works_detail = _intern(works_detail)
+        self.counts = counts
+        self.client_name = _intern(client_name)
+        self.events_category = _intern(events_category)
+        self.event_id = event_id
+        self.extra = extra or None  # ฟิลด์อื่นที่ไม่ใช่ของมาตรฐาน (ส่วนใหญ่ไม่มี)
+
+    @classmethod
+    def from_dict(cls, data):
+        if isinstance(data, cls):
+            return data
+        extra = {k: v for k, v in data.items() if k not in _ALL}
+        return cls(data.get("date", ""), data.get("timestamp", ""), data.get("employees_name", ""),
+                   data.get("works_type", ""), data.get("works_detail", ""), data.get("counts", 0),
+                   data.get("client_name", ""), data.get("events_category", ""), data.get(ID_FIELD), extra)
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def copy(self):
+        return EventRecord(*(getattr(self, f) for f in _ALL), dict(self.extra) if self.extra else None)
+
+    # --- dict-like access ---
+    def keys(self):
+        return [k for k, _ in self.items()]
+
+    def items(self):
+        out = [(f, getattr(self, f)) for f in FIELDS]
+        if self.event_id is not None:
+            out.append((ID_FIELD, self.event_id))
+        if self.extra:
+            out.extend(self.extra.items())
+        return out
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.items())
+
+    def get(self, key, default=None):
+        if key in _ALL:
+            value = getattr(self, key)
+            return default if value is None else value
+        return self.extra.get(key, default) if self.extra else default
+
+    def __getitem__(self, key):
+        value = self.get(key, _missing)
+        if value is _missing:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key in _ALL:
+            setattr(self, key, _intern(value) if key in INTERNED else value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__(self, key):
+        return self.get(key, _missing) is not _missing
+
+    def __eq__(self, other):
+        if isinstance(other, (EventRecord, dict)):
+            return self.to_dict() == dict(other.items())
+        return NotImplemented
+
+    def __repr__(self):
+        return f"EventRecord({self.to_dict()!r})"
+
+
+_missing = object()
+
+
+def to_json(obj):
+    """json.dumps(default=to_json): serialise EventRecords as plain objects."""
+    if isinstance(obj, EventRecord):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def iter_json_array(f, chunk_size=64 * 1024):
+    """Yield the elements of a JSON array from a text file one at a time.
+
+    Only about one chunk is held in memory, instead of json.load()
+    materialising the whole list (an old queue.json can be very large).
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+    started = False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            if buf[pos] == "," and not started:
+                raise ValueError("expected '['")
+            pos += 1
+        if pos >= len(buf):
+            if eof:
+                raise ValueError("unterminated JSON array")
+            fill()
+            continue
+        if not started:
+            if buf[pos] != "[":
+                raise ValueError("expected '['")
+            started = True
+            pos += 1
+            continue
+        if buf[pos] == "]":
+            return
+        try:
+            value, end = decoder.raw_decode(buf, pos)
+        except ValueError:
+            if eof:
+                raise
+            fill()
+            continue
+        if end >= len(buf) and not eof:
+            # ค่าอาจถูกตัดกลางคัน (เช่นตัวเลข) อ่านต่ออีกก้อนแล้ว decode ใหม่
+            fill()
+            continue
+        pos = end
+        yield value
+
+
+def chunked(iterable, size):
+    """Group an iterator into lists of at most `size` items, lazily."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,138 @@
+import json
+import threading
+
+from core.paths import data_path
+from core.persist import atomic_write_json
+from core.telemetry import metrics
+
+# --- Team Config Sync ---
+# A team publishes menus, categories and endpoints as one JSON document at
+# team_config_url. Each seat keeps the last copy it received (plus its
+# ETag / Last-Modified) in team_config.json:
+#   * load_config() overlays that snapshot, so startup never waits on the
+#     network;
+#   * a background poller re-fetches with If-None-Match / If-Modified-Since,
+#     so an unchanged document costs one 304 with no body;
+#   * a changed document is saved as the new snapshot and handed to
+#     `on_change`, which applies it to the running app.
+# Only TEAM_KEYS are taken from the document; per-seat settings (name,
+# geometry, lock) always stay local.
+
+SNAPSHOT_FILE = "team_config.json"
+
+
+def _str_list(value):
+    return isinstance(value, list) and all(isinstance(v, str) for v in value)
+
+
+def _menus(value):
+    return isinstance(value, dict) and all(isinstance(k, str) and _str_list(v) for k, v in value.items())
+
+
+def _url(value):
+    return isinstance(value, str) and value.startswith(("http://", "https://"))
+
+
+TEAM_KEYS = {
+    "menus": _menus,
+    "categories": lambda v: _str_list(v) and len(v) > 0,
+    "gas_url": _url,
+    "extra_gas_urls": lambda v: isinstance(v, list) and all(_url(u) for u in v),
+    "auto_hide_keywords": _str_list,
+}
+
+
+def team_values(document):
+    """The valid TEAM_KEYS entries of a fetched document; anything else is ignored."""
+    if not isinstance(document, dict):
+        return {}
+    values = {}
+    for key, check in TEAM_KEYS.items():
+        if key in document:
+            if check(document[key]):
+                values[key] = document[key]
+            else:
+                metrics.error("team config: ignoring invalid value", key=key)
+    return values
+
+
+def snapshot_path():
+    return data_path(SNAPSHOT_FILE)
+
+
+def load_snapshot(path=None):
+    """{"etag", "last_modified", "values"} from the last successful fetch, or None."""
+    try:
+        with open(path or snapshot_path(), "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(snapshot, dict) or not isinstance(snapshot.get("values"), dict):
+        return None
+    return snapshot
+
+
+def cached_team_values(path=None):
+    snapshot = load_snapshot(path)
+    return team_values(snapshot["values"]) if snapshot else {}
+
+
+class TeamConfigSync:
+    def __init__(self, url, sender, on_change, interval=300, path=None, timeout=(5, 10)):
+        self.url = url
+        self.sender = sender
+        self.on_change = on_change
+        self.interval = interval
+        self.path = path or snapshot_path()
+        self.timeout = timeout
+        snapshot = load_snapshot(self.path) or {}
+        self.etag = snapshot.get("etag")
+        self.last_modified = snapshot.get("last_modified")
+        self.values = team_values(snapshot.get("values", {}))
+        self._stop = threading.Event()
+        self._thread = None
+
+    def fetch(self):
+        """One conditional GET. Returns the new values if they changed, else None."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        with metrics.timer("team_config_fetch"):
+            response = self.sender.get(self.url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304:
+            metrics.incr("team_config_not_modified")
+            return None
+        if response.status_code != 200:
+            metrics.incr("team_config_errors")
+            return None
+        metrics.incr("team_config_downloads")
+        values = team_values(response.json())
+        changed = values != self.values
+        self.etag = response.headers.get("ETag")
+        self.last_modified = response.headers.get("Last-Modified")
+        self.values = values
+        atomic_write_json(self.path, {"etag": self.etag, "last_modified": self.last_modified,
+                                      "values": values})
+        if changed:
+            self.on_change(dict(values))
+            return values
+        return None
+
+    def start(self, initial_delay=0):
+        def run():
+            delay = initial_delay
+            while not self._stop.wait(delay):
+                try:
+                    self.fetch()
+                except Exception as e:
+                    metrics.error("team config fetch failed", detail=str(e))
+                delay = self.interval
+
+        self._thread = threading.Thread(target=run, name="team-config", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,238 @@
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from datetime import date, datetime, timedelta
+
+from core.paths import data_path
+from core.persist import WriteBehind, atomic_write_bytes
+from core.telemetry import metrics
+
+# --- Hourly / Daily Rollups ---
+# Running totals for the tray stats view, kept in fixed-size ring arrays so
+# adding a click is O(1) and the file never grows however long the app runs:
+#   * HOUR_SLOTS hourly buckets (5 weeks) and DAY_SLOTS daily buckets (~13 months);
+#   * one array('i') per series: "type:<menu>" (Actions, Wins, ...) and
+#     "item:<works_detail>";
+#   * a parallel array of bucket keys (hours / days since 0001-01-01, local
+#     time) tells which hour or day a slot currently holds; a slot that is
+#     reused for a newer bucket is zeroed first.
+# Saved as one zlib-compressed binary blob (rollup.bin), a few KB.
+
+HOUR_SLOTS = 24 * 35
+DAY_SLOTS = 400
+ACTIONS = "Actions"
+WINS = "Wins"
+
+MAGIC = b"CCR1"
+_HEADER = struct.Struct("<4sIII")   # magic, hour slots, day slots, series count
+_NAME_LEN = struct.Struct("<H")
+_SWAP = sys.byteorder != "little"   # ไฟล์เก็บแบบ little-endian เสมอ
+
+
+def hour_key(when):
+    return when.toordinal() * 24 + when.hour
+
+
+def day_key(when):
+    return when.toordinal()
+
+
+def _dump(arr):
+    if _SWAP:
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _load(typecode, data, offset, count):
+    arr = array(typecode)
+    end = offset + count * arr.itemsize
+    arr.frombytes(data[offset:end])
+    if _SWAP:
+        arr.byteswap()
+    return arr, end
+
+
+class Rollup:
+    def __init__(self, hours=HOUR_SLOTS, days=DAY_SLOTS, path=None):
+        self.path = path
+        self.hours = hours
+        self.days = days
+        self._lock = threading.Lock()
+        self._hour_keys = array("q", [-1]) * hours
+        self._day_keys = array("q", [-1]) * days
+        self._series = {}             # name -> (hourly array, daily array)
+        self._saver = None
+
+    # --- Update (O(1)) ---
+    def _column(self, name):
+        col = self._series.get(name)
+        if col is None:
+            col = self._series[name] = (array("i", [0]) * self.hours, array("i", [0]) * self.days)
+        return col
+
+    def _slot(self, keys, key, which):
+        slot = key % len(keys)
+        held = keys[slot]
+        if held == key:
+            return slot
+        if held > key:
+            return None   # เก่ากว่าช่วงที่เก็บไว้ (เช่นตอน backfill)
+        keys[slot] = key
+        for col in self._series.values():
+            col[which][slot] = 0
+        return slot
+
+    def add(self, when, menu, item, delta):
+        with self._lock:
+            hs = self._slot(self._hour_keys, hour_key(when), 0)
+            ds = self._slot(self._day_keys, day_key(when), 1)
+            for name in ("type:" + menu, "item:" + item):
+                col = self._column(name)
+                if hs is not None:
+                    col[0][hs] += delta
+                if ds is not None:
+                    col[1][ds] += delta
+
+    # --- Queries ---
+    def _values(self, which, name, last_key, count):
+        keys = self._hour_keys if which == 0 else self._day_keys
+        col = self._series.get(name)
+        out = []
+        for key in range(last_key - count + 1, last_key + 1):
+            slot = key % len(keys)
+            out.append(col[which][slot] if col is not None and keys[slot] == key else 0)
+        return out
+
+    def hourly(self, name, now, count):
+        """Bucket values for the `count` hours ending with the current one, oldest first."""
+        with self._lock:
+            return self._values(0, name, hour_key(now), count)
+
+    def daily(self, name, now, count):
+        with self._lock:
+            return self._values(1, name, day_key(now), count)
+
+    def items(self):
+        with self._lock:
+            return [name[5:] for name in self._series if name.startswith("item:")]
+
+    def summary(self, now=None, hours=12, days=14):
+        """Everything the stats view shows, computed from the buckets only."""
+        now = now or datetime.now()
+        calls_today = self.daily("type:" + ACTIONS, now, 1)[0]
+        wins_today = self.daily("type:" + WINS, now, 1)[0]
+        today_hours = self.hourly("type:" + ACTIONS, now, now.hour + 1)
+        active_hours = sum(1 for v in today_hours if v > 0)
+        calls_30 = sum(self.daily("type:" + ACTIONS, now, 30))
+        wins_30 = sum(self.daily("type:" + WINS, now, 30))
+        return {
+            "calls_today": calls_today,
+            "wins_today": wins_today,
+            "conversion_today": wins_today / calls_today if calls_today else None,
+            "calls_per_active_hour": calls_today / active_hours if active_hours else None,
+            "calls_this_hour": today_hours[-1],
+            "hourly_calls": self.hourly("type:" + ACTIONS, now, hours),
+            "hourly_wins": self.hourly("type:" + WINS, now, hours),
+            "daily_calls": self.daily("type:" + ACTIONS, now, days),
+            "daily_wins": self.daily("type:" + WINS, now, days),
+            "calls_30d": calls_30,
+            "wins_30d": wins_30,
+            "conversion_30d": wins_30 / calls_30 if calls_30 else None,
+            "items_today": self.items_on(now),
+        }
+
+    def items_on(self, day):
+        """{works_detail: count} for one day, non-zero items only."""
+        out = {}
+        for item in self.items():
+            value = self.daily("item:" + item, day, 1)[0]
+            if value:
+                out[item] = value
+        return out
+
+    # --- Persistence ---
+    def to_bytes(self):
+        with self._lock:
+            parts = [_HEADER.pack(MAGIC, self.hours, self.days, len(self._series)),
+                     _dump(self._hour_keys), _dump(self._day_keys)]
+            for name, (hourly, daily) in self._series.items():
+                encoded = name.encode("utf-8")
+                parts += [_NAME_LEN.pack(len(encoded)), encoded, _dump(hourly), _dump(daily)]
+        return zlib.compress(b"".join(parts), 6)
+
+    @classmethod
+    def from_bytes(cls, blob, path=None):
+        data = zlib.decompress(blob)
+        magic, hours, days, count = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError("not a rollup file")
+        rollup = cls(hours, days, path)
+        offset = _HEADER.size
+        rollup._hour_keys, offset = _load("q", data, offset, hours)
+        rollup._day_keys, offset = _load("q", data, offset, days)
+        for _ in range(count):
+            (length,) = _NAME_LEN.unpack_from(data, offset)
+            offset += _NAME_LEN.size
+            name = data[offset:offset + length].decode("utf-8")
+            offset += length
+            hourly, offset = _load("i", data, offset, hours)
+            daily, offset = _load("i", data, offset, days)
+            rollup._series[name] = (hourly, daily)
+        return rollup
+
+    def save(self):
+        if self.path:
+            with metrics.timer("disk_save", file="rollup"):
+                atomic_write_bytes(self.path, self.to_bytes())
+
+    def save_later(self, delay=10.0):
+        """Coalesce saves: at most one write per `delay` seconds."""
+        if self._saver is None:
+            self._saver = WriteBehind(lambda _: self.save(), delay=delay, name="rollup-writer")
+        self._saver.submit(None)
+
+    def flush(self):
+        if self._saver is not None:
+            self._saver.flush()
+
+    # --- Backfill ---
+    def backfill(self, store, now=None):
+        """Fill the buckets from the SQLite store's history (first run after an upgrade)."""
+        now = now or datetime.now()
+        start = (now - timedelta(days=self.days - 1)).strftime("%Y-%m-%d")
+        for day, hour, menu, item, total in store.hourly_totals(start, now.strftime("%Y-%m-%d")):
+            try:
+                when = datetime.combine(date.fromisoformat(day), datetime.min.time()).replace(hour=int(hour))
+            except (TypeError, ValueError):
+                continue
+            self.add(when, menu or "", item or "", total)
+
+
+def rollup_path():
+    return data_path("rollup.bin")
+
+
+def open_rollup(store=None, path=None):
+    """Load rollup.bin, or build it from the store's history on first run."""
+    path = path or rollup_path()
+    try:
+        with open(path, "rb") as f:
+            return Rollup.from_bytes(f.read(), path)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        metrics.error("rollup file unreadable, rebuilding", detail=str(e))
+    rollup = Rollup(path=path)
+    if store is not None and getattr(store, "records_history", False):
+        try:
+            rollup.backfill(store)
+        except Exception as e:
+            metrics.error("rollup backfill failed", detail=str(e))
+        try:
+            rollup.save()
+        except OSError as e:
+            metrics.error("rollup save failed", detail=str(e))
+    return rollup
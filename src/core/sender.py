@@ -0,0 +1,162 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Pooled HTTP Sender ---
+# One keep-alive Session shared by live sends, the queue drainer and the
+# updater, plus a bounded worker pool that replaces thread-per-click.
+# requests/urllib3 are imported on first use, so importing core stays cheap,
+# and the Session is built on the first request rather than in __init__, so
+# creating the sender does not delay the first frame.
+
+
+class SenderStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.connections = 0
+        self.connect_time_total = 0.0
+
+    def begin(self):
+        with self._lock:
+            self.in_flight += 1
+            self.requests += 1
+
+    def end(self, ok):
+        with self._lock:
+            self.in_flight -= 1
+            if not ok:
+                self.errors += 1
+
+    def record_connect(self, seconds):
+        with self._lock:
+            self.connections += 1
+            self.connect_time_total += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "requests": self.requests,
+                "errors": self.errors,
+                "new_connections": self.connections,
+                "reused_connections": max(0, self.requests - self.connections),
+                "handshake_seconds_total": round(self.connect_time_total, 6),
+                "handshake_seconds_avg": round(self.connect_time_total / self.connections, 6) if self.connections else 0.0,
+            }
+
+
+def _timed_connection(base, stats):
+    # connect() ครอบทั้ง TCP และ TLS handshake
+    class TimedConnection(base):
+        def connect(self):
+            start = time.perf_counter()
+            super().connect()
+            stats.record_connect(time.perf_counter() - start)
+    return TimedConnection
+
+
+def _instrumented_adapter(stats, **kwargs):
+    from requests.adapters import HTTPAdapter
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    class InstrumentedAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kw):
+            super().init_poolmanager(*args, **kw)
+            http_pool = type("TimedHTTPConnectionPool", (HTTPConnectionPool,),
+                             {"ConnectionCls": _timed_connection(HTTPConnection, stats)})
+            https_pool = type("TimedHTTPSConnectionPool", (HTTPSConnectionPool,),
+                              {"ConnectionCls": _timed_connection(HTTPSConnection, stats)})
+            self.poolmanager.pool_classes_by_scheme = {"http": http_pool, "https": https_pool}
+
+    return InstrumentedAdapter(**kwargs)
+
+
+class HttpSender:
+    def __init__(self, pool_size=4, max_workers=4, connect_timeout=5, read_timeout=10,
+                 retries=2, backoff_factor=0.5, retry_posts=False):
+        self.timeout = (connect_timeout, read_timeout)
+        self.stats = SenderStats()
+        self._pool_size = pool_size
+        self._retry_args = (retries, backoff_factor, retry_posts)
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sender")
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    def _build_session(self):
+        import requests
+        from urllib3.util.retry import Retry
+
+        retries, backoff_factor, retry_posts = self._retry_args
+        if retry_posts:
+            # เปิดเฉพาะเมื่อปลายทางตัดแถวซ้ำด้วย event_id ได้ (เช่น ingest_server)
+            # Apps Script เดิมไม่ตัด -> POST ที่ timeout แล้วส่งซ้ำจะกลายเป็นแถวซ้ำ
+            retry = Retry(total=retries, connect=retries, read=retries, status=retries,
+                          status_forcelist=(502, 503, 504), allowed_methods=None,
+                          backoff_factor=backoff_factor, raise_on_status=False)
+        else:
+            # POST ถูก retry เฉพาะตอนต่อไม่ติด (ยังไม่ได้ส่งข้อมูลออกไป) เพื่อไม่ให้เกิดแถวซ้ำ
+            retry = Retry(total=retries, connect=retries, read=0, status=retries,
+                          status_forcelist=(502, 503, 504), backoff_factor=backoff_factor,
+                          raise_on_status=False)
+        adapter = _instrumented_adapter(self.stats, pool_connections=self._pool_size,
+                                         pool_maxsize=self._pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.stats.begin()
+        ok = False
+        try:
+            response = self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+            ok = True
+            return response
+        finally:
+            self.stats.end(ok)
+
+    def post_json(self, url, payload, timeout=None):
+        return self.request("POST", url, timeout=timeout, json=payload)
+
+    def post_body(self, url, body, headers, timeout=None):
+        """POST an already encoded body (compact/gzip uploads)."""
+        return self.request("POST", url, timeout=timeout, data=body, headers=headers)
+
+    def get(self, url, timeout=None, **kwargs):
+        return self.request("GET", url, timeout=timeout, **kwargs)
+
+    def submit(self, fn, *args, **kwargs):
+        """Run fn on the bounded worker pool instead of a new thread."""
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def snapshot(self):
+        return self.stats.snapshot()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        if self._session is not None:
+            self._session.close()
+
+
+def sender_from_config(config):
+    return HttpSender(
+        pool_size=config.get("http_pool_size", 4),
+        max_workers=config.get("http_workers", 4),
+        connect_timeout=config.get("http_connect_timeout", 5),
+        read_timeout=config.get("http_read_timeout", 10),
+        retries=config.get("http_retries", 2),
+        backoff_factor=config.get("http_backoff", 0.5),
+        retry_posts=config.get("http_retry_posts", False),
+    )
@@ -0,0 +1,119 @@
+import random
+import threading
+import time
+
+from core.paths import data_path
+from core.persist import atomic_write_json
+from core.telemetry import metrics
+
+# --- Staged Startup ---
+# ClickCounterApp builds only what the first frame needs (config, queue,
+# counters, the two buttons) in __init__. Everything else is a stage that
+# runs once the window is on screen: each stage is one Tk idle callback, so
+# clicks and redraws are handled between stages. Network work that every
+# seat would otherwise fire at 9:00 sharp (update check, first team config
+# poll) is spread over a random delay instead.
+#
+# Timings are milliseconds since the process started. When all expected
+# marks are in, the report goes to the telemetry log ("startup" record) and
+# to startup.json in the data dir, for collection from the field.
+
+REPORT_FILE = "startup.json"
+
+
+class StartupScheduler:
+    def __init__(self, root, started=None, clock=time.perf_counter, report_path=None):
+        self.root = root
+        self.clock = clock
+        self.started = clock() if started is None else started
+        self.report_path = report_path or data_path(REPORT_FILE)
+        self.marks = {}
+        self.jitter = {}
+        self._stages = []
+        self._expected = set()
+        self._reported = False
+        self._lock = threading.Lock()
+
+    # --- Marks (thread-safe) ---
+    def mark(self, name):
+        elapsed = self.clock() - self.started
+        with self._lock:
+            if name in self.marks:
+                return
+            self.marks[name] = round(elapsed * 1000, 1)
+        metrics.observe("startup", elapsed, mark=name)
+        self._maybe_report()
+
+    def expect(self, *names):
+        """Marks that must be recorded before the report is written."""
+        self._expected.update(names)
+
+    # --- Stages (Tk thread) ---
+    def add_stage(self, name, fn):
+        self._stages.append((name, fn))
+
+    def run(self):
+        """Start the stages once the window has been mapped and drawn."""
+        self.root.bind("<Map>", self._on_map, add="+")
+
+    def _on_map(self, event):
+        if event.widget is self.root and "first_frame" not in self.marks:
+            # idle callback หลัง <Map> = หลังวาดหน้าต่างครั้งแรกเสร็จ
+            self.root.after_idle(self._first_frame)
+
+    def _first_frame(self):
+        self.mark("first_frame")
+        self.root.after(1, self._next_stage)
+
+    def _next_stage(self):
+        if not self._stages:
+            self.mark("stages_done")
+            return
+        name, fn = self._stages.pop(0)
+        started = self.clock()
+        try:
+            fn()
+        except Exception as e:
+            metrics.error("startup stage failed", stage=name, detail=str(e))
+        metrics.observe("startup_stage", self.clock() - started, stage=name)
+        self.mark(name)
+        # ให้ Tk จัดการคลิก/วาดจอที่ค้างอยู่ก่อน stage ถัดไป
+        self.root.after(1, lambda: self.root.after_idle(self._next_stage))
+
+    def jittered(self, name, fn, window, rng=random.uniform):
+        """Run fn on a daemon timer after a random 0..window second delay."""
+        delay = rng(0, window) if window and window > 0 else 0.0
+        self.jitter[name] = round(delay, 1)
+        timer = threading.Timer(delay, fn)
+        timer.daemon = True
+        timer.start()
+        return delay
+
+    # --- Report ---
+    def report(self):
+        with self._lock:
+            marks = dict(self.marks)
+        return {
+            "time_to_first_frame_ms": marks.get("first_frame"),
+            "time_to_tray_ms": marks.get("tray"),
+            "marks_ms": marks,
+            "jitter_s": dict(self.jitter),
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+
+    def _maybe_report(self):
+        with self._lock:
+            if self._reported or not self._expected.issubset(self.marks):
+                return
+            self._reported = True
+        report = self.report()
+        metrics.log("startup", **report)
+
+        def write():
+            try:
+                atomic_write_json(self.report_path, report)
+            except OSError as e:
+                metrics.error("startup report not saved", detail=str(e))
+
+        # ไม่เขียนไฟล์บน Tk thread
+        threading.Thread(target=write, name="startup-report", daemon=True).start()
@@ -0,0 +1,43 @@
+import json
+import os
+from datetime import datetime
+
+from core.paths import data_path
+from core.persist import atomic_write_json, quarantine_file
+from core.telemetry import metrics
+
+# --- Stats Management ---
+
+
+def stats_file():
+    return data_path("stats.json")
+
+
+def load_stats():
+    today_str = datetime.now().strftime("%Y-%m-%d")
+    default_stats = {"date": today_str, "counts": {}}
+
+    path = stats_file()
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                stats = json.load(f)
+                if stats.get("date") != today_str:
+                    return default_stats
+                return stats
+        except ValueError as e:
+            # ไฟล์เสีย: เก็บไว้เป็น stats.json.corrupt ก่อน save รอบหน้าจะเขียนทับ
+            quarantine_file(path, e)
+        except Exception:
+            pass
+    return default_stats
+
+
+def save_stats(stats):
+    # log แล้วโยนต่อ ให้ RunningCounters.flush ตั้ง dirty กลับและลองใหม่รอบหน้า
+    try:
+        with metrics.timer("disk_save", file="stats"):
+            atomic_write_json(stats_file(), stats)
+    except Exception as e:
+        metrics.error("Error saving stats", detail=str(e))
+        raise
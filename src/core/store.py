@@ -0,0 +1,326 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from core.paths import data_path
+from core.record import FIELDS, EventRecord, chunked
+from core.telemetry import metrics
+
+# --- SQLite Event Store ---
+# Every logged event is kept locally (WAL mode) with a send-status column.
+# The same table answers "today's counts" (replaces stats.json), acts as the
+# offline queue (sent = 0 rows, replaces queue.json / the journal) and
+# serves history aggregates while offline.
+#
+# Several app instances may share the database. peek() claims the rows it
+# returns with a lease (lease_owner / lease_until) inside one write
+# transaction, so two drainers never send the same pending row; ack() only
+# marks rows this store claimed. A lease left by a crashed instance expires
+# after LEASE_SECONDS and the rows become claimable again.
+#
+# Rows are returned as compact EventRecords (core.record); iter_pending()
+# pages through the unsent rows instead of loading them all.
+
+# คอลัมน์ที่อนุญาตให้ใช้ใน GROUP BY (กัน SQL injection จากชื่อคอลัมน์)
+GROUPABLE = ("date", "employees_name", "works_type", "works_detail", "client_name", "events_category")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    date            TEXT NOT NULL,
+    timestamp       TEXT NOT NULL,
+    employees_name  TEXT NOT NULL DEFAULT '',
+    works_type      TEXT NOT NULL DEFAULT '',
+    works_detail    TEXT NOT NULL DEFAULT '',
+    counts          INTEGER NOT NULL DEFAULT 0,
+    client_name     TEXT NOT NULL DEFAULT '',
+    events_category TEXT NOT NULL DEFAULT '',
+    extra           TEXT,
+    sent            INTEGER NOT NULL DEFAULT 0,
+    lease_owner     TEXT,
+    lease_until     REAL
+);
+CREATE INDEX IF NOT EXISTS idx_events_date ON events(date);
+CREATE INDEX IF NOT EXISTS idx_events_detail ON events(works_detail, date);
+CREATE INDEX IF NOT EXISTS idx_events_client ON events(client_name, date);
+CREATE INDEX IF NOT EXISTS idx_events_category ON events(events_category, date);
+CREATE INDEX IF NOT EXISTS idx_events_pending ON events(id) WHERE sent = 0;
+"""
+
+SENT_PENDING = 0
+SENT_DONE = 1
+SENT_LOCAL_ONLY = 2  # ไม่ต้องส่ง (ไม่มี gas_url หรือเป็นยอดที่ย้ายมาจาก stats.json)
+
+LEASE_SECONDS = 120
+
+
+def _check_group_by(group_by):
+    if isinstance(group_by, str):
+        group_by = (group_by,)
+    for col in group_by:
+        if col not in GROUPABLE:
+            raise ValueError(f"Cannot group by {col!r}")
+    return tuple(group_by)
+
+
+class EventStore:
+    # pipeline ใช้ค่านี้ตัดสินว่าแค่บันทึกลง store ก็พอ (stats + คิวอยู่ในตารางเดียวกัน)
+    records_history = True
+
+    def __init__(self, path, lease_seconds=LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._appended = threading.Event()
+        # timeout: รอ lock ของ process อื่นแทนที่จะ error "database is locked" ทันที
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._upgrade_schema()
+
+    def _upgrade_schema(self):
+        # ฐานข้อมูลจากเวอร์ชันก่อนยังไม่มีคอลัมน์ lease
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(events)")}
+        for name, kind in (("lease_owner", "TEXT"), ("lease_until", "REAL")):
+            if name not in columns:
+                try:
+                    self._conn.execute(f"ALTER TABLE events ADD COLUMN {name} {kind}")
+                except sqlite3.OperationalError:
+                    pass  # อีก process เพิ่มไปพร้อมกันแล้ว
+
+    # --- Writer ---
+    def _row(self, record, sent):
+        extra = {k: v for k, v in record.items() if k not in FIELDS}
+        return (record.get("date", ""), record.get("timestamp", ""), record.get("employees_name", ""),
+                record.get("works_type", ""), record.get("works_detail", ""), int(record.get("counts", 0)),
+                record.get("client_name", ""), record.get("events_category", ""),
+                json.dumps(extra, ensure_ascii=False) if extra else None, sent)
+
+    def append_many(self, records, pending=True):
+        sent = SENT_PENDING if pending else SENT_LOCAL_ONLY
+        ids = []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for record in records:
+                    cur = self._conn.execute(
+                        "INSERT INTO events (date, timestamp, employees_name, works_type, works_detail,"
+                        " counts, client_name, events_category, extra, sent)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self._row(record, sent))
+                    ids.append(cur.lastrowid)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if pending and ids:
+            self._appended.set()
+        return ids
+
+    def append(self, record):
+        return self.append_many([record])[0]
+
+    # --- Queue interface (same shape as Journal) ---
+    def _record(self, row):
+        extra = json.loads(row[9]) if row[9] else None
+        event_id = extra.pop("event_id", None) if extra else None
+        return EventRecord(*row[1:9], event_id=event_id, extra=extra)
+
+    def peek(self, max_records=1):
+        """Claim and return up to `max_records` pending rows not leased by another instance."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, date, timestamp, employees_name, works_type, works_detail, counts,"
+                    " client_name, events_category, extra FROM events WHERE sent = 0"
+                    " AND (lease_owner IS NULL OR lease_owner = ? OR lease_until < ?)"
+                    " ORDER BY id LIMIT ?", (self.owner, now, max_records)).fetchall()
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE events SET lease_owner = ?, lease_until = ?"
+                        f" WHERE id IN ({','.join('?' * len(rows))})",
+                        [self.owner, now + self.lease_seconds] + [row[0] for row in rows])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [(row[0], self._record(row)) for row in rows]
+
+    def iter_pending(self, page_size=500):
+        """Yield every unsent (id, record) lazily, oldest first, without claiming them."""
+        last = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT id, date, timestamp, employees_name, works_type, works_detail, counts,"
+                    " client_name, events_category, extra FROM events WHERE sent = 0 AND id > ?"
+                    " ORDER BY id LIMIT ?", (last, page_size)).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield row[0], self._record(row)
+            last = rows[-1][0]
+
+    def ack(self, seq):
+        """Mark every pending event this instance claimed, up to and including id `seq`, as sent."""
+        with self._lock:
+            self._conn.execute("UPDATE events SET sent = 1 WHERE sent = 0 AND lease_owner = ? AND id <= ?",
+                               (self.owner, seq))
+
+    def release(self):
+        """Give up this instance's unsent claims (on exit) so others can send them right away."""
+        with self._lock:
+            self._conn.execute("UPDATE events SET lease_owner = NULL, lease_until = NULL"
+                               " WHERE sent = 0 AND lease_owner = ?", (self.owner,))
+
+    def oldest_pending(self):
+        """The oldest unsent record (claimed or not), or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, date, timestamp, employees_name, works_type, works_detail, counts,"
+                " client_name, events_category, extra FROM events WHERE sent = 0 ORDER BY id LIMIT 1"
+            ).fetchone()
+        return self._record(row) if row else None
+
+    def lease_wait(self):
+        """Seconds until a row leased by another instance becomes claimable, or None if none is."""
+        with self._lock:
+            until = self._conn.execute(
+                "SELECT MIN(lease_until) FROM events WHERE sent = 0 AND lease_owner IS NOT NULL"
+                " AND lease_owner != ?", (self.owner,)).fetchone()[0]
+        return None if until is None else max(0.0, until - time.time())
+
+    def pending_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM events WHERE sent = 0").fetchone()[0]
+
+    def wait(self, timeout=None):
+        self._appended.clear()
+        if self.pending_count() > 0:
+            return True
+        self._appended.wait(timeout)
+        return self.pending_count() > 0
+
+    def compact(self):
+        # ประวัติเก็บไว้ทั้งหมด แค่ย้ายข้อมูลจาก WAL เข้าไฟล์หลัก
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        return 0
+
+    # --- History queries ---
+    def day_counts(self, date):
+        """{works_detail: net count} for one day — what stats.json used to hold."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT works_detail, SUM(counts) FROM events WHERE date = ? GROUP BY works_detail",
+                (date,)).fetchall()
+        return {detail: total for detail, total in rows}
+
+    def daily_totals(self, start_date, end_date, group_by=("works_detail",)):
+        """Per-day totals between two YYYY-MM-DD dates (inclusive).
+
+        Returns a list of dicts: {"date": ..., <group columns>..., "total": n}.
+        """
+        cols = _check_group_by(group_by)
+        select = ", ".join(("date",) + cols)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {select}, SUM(counts) FROM events WHERE date BETWEEN ? AND ?"
+                f" GROUP BY {select} ORDER BY {select}", (start_date, end_date)).fetchall()
+        keys = ("date",) + cols + ("total",)
+        return [dict(zip(keys, row)) for row in rows]
+
+    def range_totals(self, start_date, end_date, group_by=("events_category",)):
+        """Totals over the whole date range, e.g. "last 30 days per category"."""
+        cols = _check_group_by(group_by)
+        select = ", ".join(cols)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {select}, SUM(counts) FROM events WHERE date BETWEEN ? AND ?"
+                f" GROUP BY {select} ORDER BY {select}", (start_date, end_date)).fetchall()
+        keys = cols + ("total",)
+        return [dict(zip(keys, row)) for row in rows]
+
+    def hourly_totals(self, start_date, end_date):
+        """(date, hour "HH", works_type, works_detail, total) rows between two dates (inclusive)."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT date, substr(timestamp, 1, 2), works_type, works_detail, SUM(counts) FROM events"
+                " WHERE date BETWEEN ? AND ? GROUP BY 1, 2, 3, 4 ORDER BY 1, 2",
+                (start_date, end_date)).fetchall()
+
+    def close(self):
+        try:
+            self.release()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._conn.close()
+
+
+def open_store(lease_seconds=LEASE_SECONDS):
+    from core.filelock import FileLock
+    store = EventStore(data_path("events.db"), lease_seconds=lease_seconds)
+    # สอง instance เปิดพร้อมกัน: ให้ย้ายไฟล์เก่าแค่ตัวเดียว
+    with FileLock(data_path("migrate.lock")):
+        migrate_legacy_files(store)
+    return store
+
+
+def migrate_legacy_files(store):
+    """Import the old stats.json counts and any unsent queue.json / journal events once."""
+    from core.journal import Journal, JournalLocked
+
+    from core.offline_queue import import_legacy_queue
+    from core.persist import quarantine_file
+
+    stats_file = data_path("stats.json")
+    if os.path.exists(stats_file):
+        try:
+            with open(stats_file, "r", encoding="utf-8") as f:
+                stats = json.load(f)
+            # ยอดของวันนี้ที่ส่งไปแล้ว เก็บเป็นแถวที่ไม่ต้องส่งซ้ำ
+            carried = [{"date": stats.get("date", ""), "timestamp": "00:00:00", "works_detail": item,
+                        "counts": count} for item, count in stats.get("counts", {}).items() if count]
+        except (ValueError, AttributeError) as e:
+            quarantine_file(stats_file, e)
+        except OSError as e:
+            metrics.error("stats.json import failed, will retry", detail=str(e))
+        else:
+            # ลบไฟล์เฉพาะเมื่อบันทึกสำเร็จ ไม่สำเร็จก็เก็บไว้ย้ายใหม่รอบหน้า
+            try:
+                store.append_many(carried, pending=False)
+            except Exception as e:
+                metrics.error("stats.json import failed, will retry", detail=str(e))
+            else:
+                try:
+                    os.remove(stats_file)
+                except OSError:
+                    pass
+
+    import_legacy_queue(data_path("queue.json"), store.append_many)
+
+    journal_dir = data_path("queue")
+    if os.path.isdir(journal_dir):
+        try:
+            journal = Journal(journal_dir)
+        except JournalLocked:
+            return  # อีก instance ยังใช้ journal อยู่ ไว้ย้ายรอบหน้า
+        for batch in chunked(journal.iter_pending(), 500):
+            store.append_many([record for _, record in batch if record is not None])
+            journal.ack(batch[-1][0])
+        journal.compact()
+        journal.close()
+
+
+def today_stats(store):
+    today_str = datetime.now().strftime("%Y-%m-%d")
+    return {"date": today_str, "counts": store.day_counts(today_str)}
@@ -0,0 +1,302 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import threading
+from datetime import datetime
+
+from core import uploader
+from core.breaker import CLOSED, breaker_from_config
+from core.codec import encoder_from_config
+from core.telemetry import metrics
+
+# --- Asyncio Sync Engine ---
+# One background event loop multiplexes every (queue, endpoint) channel:
+# the primary gas_url plus any extra_gas_urls fan-out targets, and as many
+# profile queues as a deployment registers. Blocking disk/HTTP work runs on
+# the sender's bounded worker pool; the loop only schedules it.
+#
+# Fairness: a channel sends one batch per turn and then yields, and every
+# send waits on a FIFO semaphore for its endpoint, so a huge backlog on one
+# queue cannot starve the others sharing that endpoint.
+#
+# With a shared SQLite store, pending rows may all be leased by another
+# instance; the channel then sleeps until the first lease expires (or new
+# events are appended) instead of peeking in a tight loop.
+
+LEASE_RETRY_SECONDS = 5.0
+
+
+class Channel:
+    """One queue drained to one endpoint, with its own breaker and encoder."""
+
+    def __init__(self, name, url, queue, sender, breaker, encoder, bulk=False, max_events=100,
+                 max_bytes=256 * 1024, dead_letter=None):
+        self.name = name
+        self._url = url
+        self.queue = queue
+        self.sender = sender
+        self.breaker = breaker
+        self.encoder = encoder
+        self.bulk = bulk
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+        self.dead_letter = dead_letter
+
+    @property
+    def url(self):
+        # primary channel อ่านจาก config ทุกครั้ง (แก้ใน Settings แล้วมีผลทันที)
+        return self._url() if callable(self._url) else self._url
+
+    def post(self, payload, timeout=None):
+        """POST and feed the outcome to the circuit breaker.
+
+        Returns the status code, or (status, accepted_ids) when the endpoint
+        acknowledges event IDs.
+        """
+        body, headers = self.encoder.encode(payload)
+        try:
+            with metrics.timer("http_send", channel=self.name):
+                response = self.sender.post_body(self.url, body, headers, timeout=timeout)
+        except Exception:
+            self.breaker.record_failure()
+            metrics.incr("http_errors", channel=self.name)
+            raise
+        self.encoder.observe(response)
+        status = response.status_code
+        if status != 200 and status not in uploader.REJECT_STATUS_CODES:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        accepted = accepted_ids(response) if status == 200 else None
+        if accepted is not None and self.encoder.aggregate:
+            # ปลายทางตัดแถวซ้ำราย event_id: ส่งรายคลิกแทนการรวมรายนาที
+            # (batch ที่ส่งซ้ำแล้วมีคลิกเพิ่ม จะได้ ID ใหม่ ทำให้นับซ้ำ)
+            # batch นี้รวมไปแล้ว เทียบราย ID ไม่ได้ ถือว่ารับครบ
+            self.encoder.aggregate = False
+            metrics.log("aggregate_off", channel=self.name)
+            return status
+        if accepted is not None:
+            return status, accepted
+        return status
+
+    def send_next_batch(self):
+        """Blocking: send one batch. Returns (events_sent, ok); (0, True) when the queue is empty."""
+        with metrics.timer("drain_batch", channel=self.name):
+            batch = uploader.take_batch(self.queue, self.max_events if self.bulk else 1, self.max_bytes)
+            if not batch:
+                return 0, True
+            ok = uploader.deliver(self.queue, self.post, batch, self.bulk, self.dead_letter)
+        if ok:
+            metrics.incr("events_sent", len(batch), channel=self.name)
+        return (len(batch) if ok else 0), ok
+
+    def oldest_unsent_age(self, now=None):
+        """Seconds since the oldest unsent event was logged (0 when the queue is empty)."""
+        record = self.queue.oldest_pending()
+        if not record:
+            return 0
+        try:
+            logged = datetime.strptime(f"{record['date']} {record['timestamp']}", "%Y-%m-%d %H:%M:%S")
+        except (KeyError, ValueError):
+            return None
+        return max(0, int(((now or datetime.now()) - logged).total_seconds()))
+
+    def register_gauges(self):
+        metrics.gauge("queue_depth", self.queue.pending_count, channel=self.name)
+        metrics.gauge("oldest_unsent_age_seconds", self.oldest_unsent_age, channel=self.name)
+        metrics.gauge("circuit_open", lambda: 0 if self.breaker.state == CLOSED else 1, channel=self.name)
+
+
+class SyncEngine:
+    def __init__(self, sender, endpoint_concurrency=2, idle_timeout=300):
+        self.sender = sender
+        self.endpoint_concurrency = endpoint_concurrency
+        self.idle_timeout = idle_timeout
+        self.channels = {}
+        self._channels_lock = threading.Lock()
+        self.loop = None
+        self._wakes = {}
+        self._endpoint_slots = {}
+        self._tasks = {}
+        self._inflight = set()
+        self._thread = None
+        self._started = threading.Event()
+        self._running = False
+
+    # --- Lifecycle ---
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run_loop, name="sync-engine", daemon=True)
+        self._thread.start()
+        self._started.wait(5)
+        return self
+
+    def _run_loop(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        for channel in self.channel_list():
+            self._spawn(channel)
+        self._started.set()
+        self.loop.run_forever()
+        self.loop.close()
+
+    def stop(self, timeout=15):
+        self._running = False
+        if self.loop is None:
+            return
+
+        async def shutdown():
+            tasks = list(self._tasks.values())
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.loop.stop()
+
+        self.loop.call_soon_threadsafe(lambda: self.loop.create_task(shutdown()))
+        self._thread.join(timeout=5)
+        # batch ที่กำลังส่งอยู่ต้องได้ ack ก่อนปิดคิว ไม่งั้นจะถูกส่งซ้ำรอบหน้า
+        concurrent.futures.wait(list(self._inflight), timeout=timeout)
+
+    # --- Thread-safe API ---
+    def add_channel(self, channel):
+        with self._channels_lock:
+            self.channels[channel.name] = channel
+        channel.register_gauges()
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._spawn, channel)
+        return channel
+
+    def channel_list(self):
+        """Snapshot of the channels; safe to iterate while another thread adds one."""
+        with self._channels_lock:
+            return list(self.channels.values())
+
+    def notify(self, name=None):
+        """Wake one channel (or all of them) because its queue has new records."""
+        if self.loop is None:
+            return
+        self.loop.call_soon_threadsafe(self._wake, name)
+
+    def submit(self, name, events):
+        """Append events to a channel's queue without blocking the caller (e.g. the Tk thread)."""
+        channel = self.channels[name]
+
+        def append():
+            if hasattr(channel.queue, "append_many"):
+                channel.queue.append_many(events)
+            else:
+                for event in events:
+                    channel.queue.append(event)
+
+        future = self.sender.submit(append)
+        future.add_done_callback(lambda f: self.notify(name))
+        return future
+
+    # --- Loop side ---
+    def _wake(self, name):
+        targets = [name] if name else list(self._wakes)
+        for target in targets:
+            event = self._wakes.get(target)
+            if event is not None:
+                event.set()
+
+    def _spawn(self, channel):
+        if channel.name in self._tasks:
+            return  # ถูกเพิ่มระหว่างที่ loop กำลังเริ่ม
+        self._wakes[channel.name] = asyncio.Event()
+        self._tasks[channel.name] = self.loop.create_task(self._drain_channel(channel))
+
+    def _slot(self, url):
+        slot = self._endpoint_slots.get(url)
+        if slot is None:
+            slot = self._endpoint_slots[url] = asyncio.Semaphore(self.endpoint_concurrency)
+        return slot
+
+    async def _blocking(self, fn, *args):
+        future = self.sender.submit(fn, *args)
+        self._inflight.add(future)
+        future.add_done_callback(self._inflight.discard)
+        return await asyncio.wrap_future(future)
+
+    async def _wait_for_wake(self, wake, timeout):
+        try:
+            await asyncio.wait_for(wake.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        wake.clear()
+
+    def _lease_wait(self, channel):
+        lease_wait = getattr(channel.queue, "lease_wait", None)
+        delay = lease_wait() if lease_wait is not None else None
+        if delay is None:
+            return LEASE_RETRY_SECONDS
+        return min(max(delay, 0.1), self.idle_timeout)
+
+    async def _drain_channel(self, channel):
+        wake = self._wakes[channel.name]
+        while self._running:
+            try:
+                pending = await self._blocking(channel.queue.pending_count)
+                if not pending or not channel.url:
+                    # หลับรอจนกว่าจะมีของเข้าคิว
+                    await self._wait_for_wake(wake, self.idle_timeout)
+                    continue
+                delay = channel.breaker.seconds_until_retry()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if not channel.breaker.allow_request():
+                    await asyncio.sleep(1)
+                    continue
+                async with self._slot(channel.url):
+                    sent, ok = await self._blocking(channel.send_next_batch)
+                if ok and not sent:
+                    # มีของค้างแต่ instance อื่นถือ lease อยู่ทั้งหมด: อย่าวน peek ถี่ๆ
+                    # รอจน lease แรกหมดอายุ หรือมีของใหม่เข้าคิว
+                    await self._wait_for_wake(wake, await self._blocking(self._lease_wait, channel))
+                    continue
+                # ให้ channel อื่นได้ส่งบ้าง
+                await asyncio.sleep(0)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                await asyncio.sleep(1)
+
+
+def accepted_ids(response):
+    """The "accepted" ID list of a JSON reply, or None (e.g. the legacy Apps Script reply)."""
+    try:
+        reply = response.json()
+    except Exception:
+        return None
+    if isinstance(reply, dict) and isinstance(reply.get("accepted"), list):
+        return reply["accepted"]
+    return None
+
+
+def outbox_dir_name(url):
+    return "outbox-" + hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+
+
+def make_channel(config, name, url, queue, sender, dead_letter=None):
+    return Channel(name, url, queue, sender, breaker_from_config(config), encoder_from_config(config),
+                   bulk=config.get("bulk_upload", False),
+                   max_events=config.get("bulk_max_events", 100),
+                   max_bytes=config.get("bulk_max_bytes", 256 * 1024),
+                   dead_letter=dead_letter)
+
+
+def channels_from_config(config, primary_queue, sender, dead_letter=None, open_journal=None, skip=()):
+    """The primary gas_url channel plus one journal-backed channel per extra_gas_urls entry.
+
+    Channels named in `skip` (already running) are not created again.
+    """
+    channels = []
+    if "primary" not in skip:
+        channels.append(make_channel(config, "primary", lambda: config.get("gas_url", ""), primary_queue,
+                                     sender, dead_letter))
+    if open_journal is not None:
+        for url in config.get("extra_gas_urls", []):
+            if url and url not in skip:
+                channels.append(make_channel(config, url, url, open_journal(outbox_dir_name(url)), sender,
+                                             dead_letter))
+    return channels
@@ -0,0 +1,264 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# --- Telemetry ---
+# In-process timers, counters and gauges for the hot paths (log_data,
+# show_popup, disk saves, HTTP sends, queue drains). Recording is a
+# perf_counter() call plus a dict update under a lock; nothing touches the
+# disk on the hot path. Two optional sinks:
+#   * a rotating JSON-lines log (telemetry.log in the data dir) with a
+#     periodic snapshot, slow-operation records and errors;
+#   * a localhost-only Prometheus text endpoint (GET /metrics).
+# logging and http.server are imported only when a sink is started.
+
+PREFIX = "clickcounter_"
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=None):
+    pairs = list(key) + (list(extra.items()) if extra else [])
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+class _Timer:
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+
+class Telemetry:
+    def __init__(self, slow_threshold=0.1):
+        self.slow_threshold = slow_threshold
+        self._lock = threading.Lock()
+        self._timers = {}
+        self._counters = {}
+        self._gauges = {}         # key -> callable() or value
+        self._logger = None
+        self._reporter = None
+        self._listener = None
+        self._server = None
+
+    # --- Recording ---
+    def observe(self, name, seconds, **labels):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            timer = self._timers.get(key)
+            if timer is None:
+                timer = self._timers[key] = _Timer()
+            timer.add(seconds)
+        if seconds >= self.slow_threshold and self._logger is not None:
+            self.log("slow", op=name, ms=round(seconds * 1000, 2), **labels)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def timed(self, name, **labels):
+        """Decorator form of timer()."""
+        def wrap(fn):
+            def inner(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return fn(*args, **kwargs)
+            inner.__name__ = fn.__name__
+            inner.__doc__ = fn.__doc__
+            return inner
+        return wrap
+
+    def incr(self, name, amount=1, **labels):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def gauge(self, name, value_or_fn, **labels):
+        """Set a gauge; pass a callable to have it evaluated at read time."""
+        with self._lock:
+            self._gauges[(name, _labels_key(labels))] = value_or_fn
+
+    def _read_gauges(self):
+        with self._lock:
+            gauges = list(self._gauges.items())
+        values = []
+        for key, value in gauges:
+            if callable(value):
+                try:
+                    value = value()
+                except Exception:
+                    continue
+            if value is not None:
+                values.append((key, value))
+        return values
+
+    # --- Output ---
+    def snapshot(self):
+        with self._lock:
+            timers = {k: (t.count, t.total, t.max) for k, t in self._timers.items()}
+            counters = dict(self._counters)
+        out = {"timers": {}, "counters": {}, "gauges": {}}
+        for (name, key), (count, total, peak) in timers.items():
+            out["timers"][name + _format_labels(key)] = {
+                "count": count, "avg_ms": round(total / count * 1000, 3) if count else 0,
+                "max_ms": round(peak * 1000, 3)}
+        for (name, key), value in counters.items():
+            out["counters"][name + _format_labels(key)] = value
+        for (name, key), value in self._read_gauges():
+            out["gauges"][name + _format_labels(key)] = value
+        return out
+
+    def render_prometheus(self):
+        lines = []
+        with self._lock:
+            timers = [(k, t.count, t.total, list(t.buckets)) for k, t in self._timers.items()]
+            counters = list(self._counters.items())
+        seen = set()
+        for (name, key), count, total, buckets in sorted(timers):
+            metric = f"{PREFIX}{name}_seconds"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            running = 0
+            for bound, n in zip(BUCKETS, buckets):
+                running += n
+                lines.append(f"{metric}_bucket{_format_labels(key, {'le': bound})} {running}")
+            lines.append(f"{metric}_bucket{_format_labels(key, {'le': '+Inf'})} {count}")
+            lines.append(f"{metric}_sum{_format_labels(key)} {total:.6f}")
+            lines.append(f"{metric}_count{_format_labels(key)} {count}")
+        for (name, key), value in sorted(counters):
+            metric = f"{PREFIX}{name}_total"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_format_labels(key)} {value}")
+        for (name, key), value in sorted(self._read_gauges(), key=lambda kv: kv[0]):
+            metric = PREFIX + name
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    # --- Sinks ---
+    def log(self, kind, **fields):
+        if self._logger is None:
+            return
+        record = {"ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "kind": kind}
+        record.update(fields)
+        try:
+            self._logger.info(json.dumps(record, ensure_ascii=False, default=str))
+        except Exception:
+            pass
+
+    def error(self, message, **fields):
+        self.log("error", message=message, **fields)
+
+    def start_log(self, path, max_bytes=1024 * 1024, backups=3, interval=60.0):
+        """Rotating JSON-lines log plus a snapshot every `interval` seconds."""
+        import logging
+        import queue
+        from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8",
+                                      delay=True)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        # เขียนไฟล์บน thread ของ listener เสมอ ผู้เรียก (เช่น Tk thread) แค่ใส่คิว
+        records = queue.SimpleQueue()
+        self._listener = QueueListener(records, handler)
+        self._listener.start()
+        logger = logging.getLogger("clickcounter.telemetry")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(QueueHandler(records))
+        self._logger = logger
+
+        if interval and self._reporter is None:
+            def report():
+                while True:
+                    time.sleep(interval)
+                    self.log("snapshot", **self.snapshot())
+
+            self._reporter = threading.Thread(target=report, name="telemetry-report", daemon=True)
+            self._reporter.start()
+        return self
+
+    def serve(self, port, host="127.0.0.1"):
+        """Prometheus text endpoint on localhost only. Returns the bound port."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        telemetry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = telemetry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self._server.server_address[1]
+
+
+    def close(self):
+        """Write a final snapshot and drain the log queue (call before os._exit)."""
+        if self._listener is not None:
+            self.log("snapshot", **self.snapshot())
+            self._listener.stop()
+            self._listener = None
+            self._logger = None
+
+
+# ตัวเดียวใช้ทั้งโปรแกรม (เหมือน logger) ทุก module import แล้วเรียกได้เลย
+metrics = Telemetry()
+
+
+def telemetry_from_config(config, log_path=None):
+    metrics.slow_threshold = config.get("telemetry_slow_ms", 100) / 1000.0
+    if config.get("telemetry_log", True) and log_path:
+        metrics.start_log(log_path, max_bytes=config.get("telemetry_log_bytes", 1024 * 1024),
+                          interval=config.get("telemetry_interval_seconds", 60))
+    port = config.get("metrics_port", 0)
+    if port:
+        try:
+            metrics.serve(port)
+        except OSError as e:
+            metrics.error("metrics endpoint failed to start", port=port, detail=str(e))
+    return metrics
@@ -0,0 +1,191 @@
+import hashlib
+import os
+import sys
+import time
+
+from core.patch import PatchError, apply_patch, find_chain
+from core.paths import data_path
+from core.persist import atomic_write_bytes
+
+# --- Self Update ---
+# The new exe is streamed into <data dir>/updates/<name>.part. An aborted
+# download is resumed with an HTTP Range request on the next attempt (or the
+# next app start), the finished file is checked against the SHA-256 published
+# in version.json, and only then renamed into place. A release without a
+# "sha256" is refused rather than installed unverified. The running exe is
+# swapped by a small batch script after the app exits.
+#
+# When version.json lists "patches" (see core.patch / tools/make_patch.py)
+# and a chain leads from the running version to the new one, only the
+# patches are downloaded and applied to the current exe; any failure falls
+# back to the full download.
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+NETWORK_READ_SIZE = 64 * 1024
+
+
+class UpdateError(Exception):
+    pass
+
+
+def updates_dir():
+    path = data_path("updates")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def file_sha256(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _total_size(response, offset):
+    if response.status_code == 206:
+        # Content-Range: bytes 100-999/1000
+        total = response.headers.get("Content-Range", "").rpartition("/")[2]
+        if total.isdigit():
+            return int(total)
+    length = response.headers.get("Content-Length")
+    if length and length.isdigit():
+        return int(length) + (offset if response.status_code == 206 else 0)
+    return None
+
+
+def _fetch(sender, url, part_path, chunk_size, timeout, progress):
+    """One download attempt, resuming from whatever is already in part_path."""
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+    response = sender.get(url, timeout=timeout, stream=True, headers=headers)
+    try:
+        if response.status_code == 416:
+            # ได้ไฟล์ครบแล้วจากรอบก่อน (หรือไฟล์บน server เปลี่ยน) ให้ hash เป็นตัวตัดสิน
+            return
+        if response.status_code not in (200, 206):
+            raise UpdateError(f"Download failed: HTTP {response.status_code}")
+        if response.status_code == 200:
+            # server ไม่รองรับ Range: เริ่มใหม่ตั้งแต่ต้น
+            offset = 0
+        total = _total_size(response, offset)
+        done = offset
+        reported = done
+        # อ่านจาก socket ทีละ NETWORK_READ_SIZE แต่เขียนดิสก์/รายงาน progress ทีละ chunk_size
+        # ถ้าเน็ตหลุด ข้อมูลที่อ่านได้แล้วยังถูก flush ลง .part ตอนปิดไฟล์
+        with open(part_path, "ab" if offset else "wb", buffering=chunk_size) as f:
+            for chunk in response.iter_content(chunk_size=min(chunk_size, NETWORK_READ_SIZE)):
+                if not chunk:
+                    continue
+                f.write(chunk)
+                done += len(chunk)
+                if progress and (done - reported >= chunk_size or done == total):
+                    reported = done
+                    progress(done, total)
+            f.flush()
+            os.fsync(f.fileno())
+        if total is not None and done < total:
+            raise OSError(f"Connection closed after {done} of {total} bytes")
+    finally:
+        response.close()
+
+
+def download(sender, url, dest_path, expected_sha256=None, chunk_size=DEFAULT_CHUNK_SIZE,
+             progress=None, timeout=(5, 30), attempts=5, retry_delay=2.0):
+    """Download url to dest_path with resume and hash verification.
+
+    Gives up after `attempts` consecutive interruptions that made no progress.
+
+    progress(done_bytes, total_bytes_or_None) is called after every chunk_size bytes.
+    Raises UpdateError when the file cannot be fetched or fails verification.
+    """
+    part_path = dest_path + ".part"
+    failures = 0
+    while True:
+        before = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        try:
+            _fetch(sender, url, part_path, chunk_size, timeout, progress)
+            break
+        except UpdateError:
+            raise
+        except OSError:
+            # เน็ตหลุดกลางทาง: ส่วนที่ได้มาแล้วอยู่ใน .part รอบหน้าขอต่อจากตรงนั้น
+            # นับเฉพาะรอบที่ไม่ได้ข้อมูลเพิ่มเลย
+            progressed = os.path.exists(part_path) and os.path.getsize(part_path) > before
+            failures = 0 if progressed else failures + 1
+            if failures >= attempts:
+                raise UpdateError("Download interrupted too many times")
+            time.sleep(retry_delay * (failures + 1))
+
+    if expected_sha256:
+        actual = file_sha256(part_path, chunk_size)
+        if actual.lower() != expected_sha256.lower():
+            os.remove(part_path)
+            raise UpdateError(f"SHA-256 mismatch: expected {expected_sha256}, got {actual}")
+    os.replace(part_path, dest_path)
+    return dest_path
+
+
+def patch_update(sender, release, current_version, current_exe, dest_path,
+                 chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Build the new exe from patches. Returns dest_path, or None when no patch chain applies."""
+    chain = find_chain(release.get("patches"), current_version, release.get("version"))
+    if not chain or not current_exe or not os.path.isfile(current_exe):
+        return None
+    with open(current_exe, "rb") as f:
+        data = f.read()
+    for entry in chain:
+        patch_path = os.path.join(updates_dir(), f"{entry['from']}-{entry['to']}.ccpatch")
+        download(sender, entry["url"], patch_path, expected_sha256=entry.get("sha256"),
+                 chunk_size=chunk_size, progress=progress)
+        try:
+            with open(patch_path, "rb") as f:
+                data = apply_patch(data, f.read())
+        finally:
+            os.remove(patch_path)
+    expected = release.get("sha256")
+    if not expected:
+        raise PatchError("No SHA-256 published for the patched exe")
+    if hashlib.sha256(data).hexdigest() != expected.lower():
+        raise PatchError("Patched exe does not match the published SHA-256")
+    atomic_write_bytes(dest_path, data)
+    return dest_path
+
+
+def fetch_release(sender, release, current_version, current_exe, dest_path,
+                  chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Get the new exe for a version.json entry: patch chain first, full download as fallback."""
+    if not release.get("sha256"):
+        raise UpdateError("version.json has no sha256 for this release; refusing to install an unverified update")
+    try:
+        if patch_update(sender, release, current_version, current_exe, dest_path, chunk_size, progress):
+            return dest_path
+    except (PatchError, UpdateError, OSError):
+        pass
+    return download(sender, release["url"], dest_path, expected_sha256=release.get("sha256"),
+                    chunk_size=chunk_size, progress=progress)
+
+
+def swap_script(new_exe, current_exe, pid):
+    """Batch file that waits for this process to exit, moves the new exe over the old one and restarts."""
+    return f"""@echo off
+:wait
+tasklist /FI "PID eq {pid}" 2>NUL | find "{pid}" >NUL
+if not errorlevel 1 (
+    timeout /t 1 /nobreak > NUL
+    goto wait
+)
+move /Y "{new_exe}" "{current_exe}" > NUL
+start "" "{current_exe}"
+del "%~f0"
+"""
+
+
+def install_update(new_exe, current_exe=None):
+    """Launch the swap script; the caller must exit the app right after."""
+    import subprocess
+    current_exe = current_exe or sys.executable
+    script = os.path.join(updates_dir(), "update.bat")
+    with open(script, "w", encoding="utf-8") as f:
+        f.write(swap_script(new_exe, current_exe, os.getpid()))
+    subprocess.Popen(["cmd", "/c", script], creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0))
@@ -0,0 +1,114 @@
+import json
+
+from core.record import to_json
+
+# --- Batched Queue Drainer ---
+# `post(payload)` is supplied by the caller and returns the HTTP status code
+# (or raises on a network error). In bulk mode the payload is a JSON array of
+# events, otherwise it is a single event dict as the endpoint always expected.
+#
+# Endpoints that deduplicate by event_id may answer {"accepted": [ids]}; then
+# `post` returns (status, accepted_ids) and a 200 that leaves some of the
+# batch unaccepted is treated like a rejection, so the batch is split until
+# the record the server refuses is isolated. Re-sending an accepted ID is
+# harmless, which is what makes timeouts and retries safe.
+
+SEND_OK = "ok"
+SEND_REJECTED = "rejected"   # ตัว batch มีปัญหา (เช่น ข้อมูลเสีย/ใหญ่เกิน) -> แบ่งครึ่งแล้วลองใหม่
+SEND_FAILED = "failed"       # เน็ตหรือ server มีปัญหา -> หยุดไว้ก่อน ค่อยลองรอบหน้า
+
+REJECT_STATUS_CODES = (400, 413, 422)
+
+
+def record_size(record):
+    return len(json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=to_json).encode("utf-8")) + 1
+
+
+def take_batch(queue, max_events, max_bytes):
+    """Peek the next batch, limited by both event count and encoded size.
+
+    The first record is always included, even if it alone exceeds max_bytes.
+    """
+    items = queue.peek(max_events)
+    batch = []
+    total = 2
+    for seq, record in items:
+        size = record_size(record)
+        if batch and total + size > max_bytes:
+            break
+        batch.append((seq, record))
+        total += size
+    return batch
+
+
+def _ids(payload):
+    records = payload if isinstance(payload, list) else [payload]
+    return {r.get("event_id") for r in records if r.get("event_id")}
+
+
+def classify(post, payload):
+    try:
+        status = post(payload)
+    except Exception:
+        return SEND_FAILED
+    accepted = None
+    if isinstance(status, tuple):
+        status, accepted = status
+    if status == 200:
+        if accepted is not None and not _ids(payload) <= set(accepted):
+            return SEND_REJECTED
+        return SEND_OK
+    if status in REJECT_STATUS_CODES:
+        return SEND_REJECTED
+    return SEND_FAILED
+
+
+def deliver(queue, post, batch, bulk=True, dead_letter=None):
+    """Send `batch` and ack it. A rejected batch is split in half until the
+    poison record is isolated; that record goes to `dead_letter` and is acked.
+
+    Returns False if a transient failure stopped delivery.
+    """
+    if not bulk and len(batch) > 1:
+        for item in batch:
+            if not deliver(queue, post, [item], bulk, dead_letter):
+                return False
+        return True
+
+    records = [record for _, record in batch]
+    if any(record is None for record in records):
+        result = SEND_REJECTED
+    else:
+        result = classify(post, records if bulk else records[0])
+
+    if result == SEND_OK:
+        queue.ack(batch[-1][0])
+        return True
+    if result == SEND_FAILED:
+        return False
+
+    if len(batch) == 1:
+        if dead_letter:
+            dead_letter(batch[0][1])
+        queue.ack(batch[0][0])
+        return True
+    mid = len(batch) // 2
+    return (deliver(queue, post, batch[:mid], bulk, dead_letter)
+            and deliver(queue, post, batch[mid:], bulk, dead_letter))
+
+
+def drain(queue, post, bulk=True, max_events=100, max_bytes=256 * 1024, dead_letter=None):
+    """Keep sending batches while sends succeed.
+
+    Returns (events_acked, ok) where ok is False if a failure stopped the drain.
+    """
+    sent = 0
+    if not bulk:
+        max_events = 1
+    while True:
+        batch = take_batch(queue, max_events, max_bytes)
+        if not batch:
+            return sent, True
+        if not deliver(queue, post, batch, bulk, dead_letter):
+            return sent, False
+        sent += len(batch)
@@ -0,0 +1,431 @@
+"""Self-hostable ingest service for ClickCounter.
+
+Point the clients' gas_url at this server instead of the Apps Script web
+app. It accepts the same bodies (single event, JSON array, compact "cc1",
+gzip), stores them in a local SQLite buffer deduplicated by event_id and
+answers at once; a forwarder thread appends the buffered rows to the sheet
+in large periodic batches. Per-employee daily totals are served back from
+the buffer.
+
+    python src/ingest_server.py --port 8080 --forward-url https://script.google.com/macros/s/.../exec
+
+Batches are JSON arrays, so the sheet's web app must accept arrays: deploy
+tools/sheet_bulk_handler.gs as its doPost first. --forward-single falls back
+to one POST per event for a sheet still running the old single-object script.
+
+A batch containing an invalid event (missing date, non-numeric counts, ...)
+is refused with 400 as a whole, so the client's split-and-isolate path
+moves just that record to its dead-letter file.
+
+    POST /exec                              ingest (same reply shape as tools/standin.py)
+    GET  /totals?employee=Ann&date=2026-01-05   {"employees_name", "date", "counts": {item: n}}
+    GET  /totals?date=2026-01-05               {"date", "employees": {name: {item: n}}}
+    GET  /health                            buffer and forwarder status
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from core.breaker import CircuitBreaker
+from core.codec import decode_body
+from core.record import FIELDS, ID_FIELD
+
+# --- Ingest Buffer ---
+# One row per event. event_id is UNIQUE, so a retried batch is inserted
+# once; events without an ID (old clients) are always inserted. Only the
+# event_id conflict is ignored (ON CONFLICT ... DO NOTHING, not INSERT OR
+# IGNORE), so a constraint violation still fails the batch. The
+# `totals` table is kept up to date in the same transaction, so the
+# totals endpoint is a primary-key lookup however large the buffer gets.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    event_id        TEXT UNIQUE,
+    date            TEXT NOT NULL,
+    timestamp       TEXT NOT NULL,
+    employees_name  TEXT NOT NULL DEFAULT '',
+    works_type      TEXT NOT NULL DEFAULT '',
+    works_detail    TEXT NOT NULL DEFAULT '',
+    counts          INTEGER NOT NULL DEFAULT 0,
+    client_name     TEXT NOT NULL DEFAULT '',
+    events_category TEXT NOT NULL DEFAULT '',
+    extra           TEXT,
+    received        REAL NOT NULL,
+    forwarded       INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_events_unforwarded ON events(id) WHERE forwarded = 0;
+CREATE TABLE IF NOT EXISTS totals (
+    date            TEXT NOT NULL,
+    employees_name  TEXT NOT NULL,
+    works_detail    TEXT NOT NULL,
+    total           INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (date, employees_name, works_detail)
+);
+"""
+
+
+TEXT_FIELDS = ("timestamp", "employees_name", "works_type", "works_detail", "client_name", "events_category")
+
+
+def clean_event(e):
+    """Validate one decoded event and return its buffer row values; raises ValueError.
+
+    Optional text fields that are missing or null become "", numbers are
+    turned into text; "date" must be a non-empty string and "counts" an
+    integer (or a string/float holding one).
+    """
+    if not isinstance(e, dict):
+        raise ValueError("event is not an object")
+    date = e.get("date")
+    if not isinstance(date, str) or not date:
+        raise ValueError("missing date")
+    fields = {"date": date}
+    for name in TEXT_FIELDS:
+        value = e.get(name)
+        if value is None:
+            value = ""
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = str(value)
+        elif not isinstance(value, str):
+            raise ValueError(f"bad {name}")
+        fields[name] = value
+    counts = e.get("counts", 0)
+    if isinstance(counts, bool) or counts is None:
+        raise ValueError("bad counts")
+    try:
+        fields["counts"] = int(counts)
+    except (TypeError, ValueError):
+        raise ValueError("bad counts") from None
+    if isinstance(counts, float) and counts != fields["counts"]:
+        raise ValueError("bad counts")
+    event_id = e.get(ID_FIELD)
+    if event_id is not None and not isinstance(event_id, str):
+        raise ValueError(f"bad {ID_FIELD}")
+    fields[ID_FIELD] = event_id or None
+    fields["extra"] = {k: v for k, v in e.items() if k not in FIELDS and k != ID_FIELD} or None
+    return fields
+
+
+class IngestStore:
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def ingest(self, events):
+        """Insert a batch of clean_event() rows in one transaction.
+
+        Returns (accepted_ids, inserted, duplicates).
+        """
+        now = time.time()
+        accepted = []
+        inserted = duplicates = 0
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for e in events:
+                    event_id = e[ID_FIELD]
+                    extra = e["extra"]
+                    row = (event_id, e["date"], e["timestamp"], e["employees_name"], e["works_type"],
+                           e["works_detail"], e["counts"], e["client_name"], e["events_category"],
+                           json.dumps(extra, ensure_ascii=False) if extra else None, now)
+                    cur = self._conn.execute(
+                        "INSERT INTO events (event_id, date, timestamp, employees_name, works_type,"
+                        " works_detail, counts, client_name, events_category, extra, received)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                        " ON CONFLICT (event_id) DO NOTHING", row)
+                    if event_id:
+                        accepted.append(event_id)
+                    if cur.rowcount == 0:
+                        duplicates += 1
+                        continue
+                    inserted += 1
+                    self._conn.execute(
+                        "INSERT INTO totals (date, employees_name, works_detail, total) VALUES (?, ?, ?, ?)"
+                        " ON CONFLICT (date, employees_name, works_detail) DO UPDATE SET total = total + ?",
+                        (row[1], row[3], row[5], row[6], row[6]))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return accepted, inserted, duplicates
+
+    def unforwarded(self, limit):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, event_id, date, timestamp, employees_name, works_type, works_detail, counts,"
+                " client_name, events_category, extra FROM events WHERE forwarded = 0 ORDER BY id LIMIT ?",
+                (limit,)).fetchall()
+        batch = []
+        for row in rows:
+            event = dict(zip(FIELDS, row[2:10]))
+            if row[10]:
+                event.update(json.loads(row[10]))
+            if row[1]:
+                event[ID_FIELD] = row[1]
+            batch.append((row[0], event))
+        return batch
+
+    def mark_forwarded(self, last_id):
+        with self._lock:
+            self._conn.execute("UPDATE events SET forwarded = 1 WHERE forwarded = 0 AND id <= ?", (last_id,))
+
+    def pending_forward(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM events WHERE forwarded = 0").fetchone()[0]
+
+    def event_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+    def totals(self, date, employee=None):
+        """{employee: {works_detail: total}} for one day (or just one employee's counts)."""
+        sql = "SELECT employees_name, works_detail, total FROM totals WHERE date = ?"
+        args = [date]
+        if employee is not None:
+            sql += " AND employees_name = ?"
+            args.append(employee)
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+        out = {}
+        for name, item, total in rows:
+            out.setdefault(name, {})[item] = total
+        return out
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# --- Forwarder ---
+# Every `interval` seconds, send the buffered rows to the sheet endpoint
+# until the buffer is empty or a send fails, as JSON arrays of up to
+# `batch_size` events (the format tools/sheet_bulk_handler.gs accepts and
+# writes with one setValues call). bulk=False (--forward-single) sends one
+# single-object POST per event for the old sheet script. Rows are marked
+# forwarded after each successful POST. Failures back off through the same
+# circuit breaker the clients use.
+
+class Forwarder:
+    def __init__(self, store, url, sender, batch_size=500, interval=30.0, breaker=None, bulk=True):
+        self.store = store
+        self.url = url
+        self.sender = sender
+        self.batch_size = batch_size
+        self.bulk = bulk
+        self.interval = interval
+        self.breaker = breaker or CircuitBreaker(failure_threshold=1, base_delay=interval, max_delay=600)
+        self.forwarded = 0
+        self.requests = 0
+        self.last_error = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def forward_once(self):
+        """Send buffered rows until empty or a failure. Returns how many were forwarded."""
+        sent = 0
+        while self.breaker.allow_request():
+            batch = self.store.unforwarded(self.batch_size)
+            if not batch:
+                break
+            if self.bulk:
+                posts = [(batch[-1][0], [event for _, event in batch], len(batch))]
+            else:
+                posts = [(row_id, event, 1) for row_id, event in batch]
+            failed = False
+            for last_id, payload, count in posts:
+                if not self._post(payload):
+                    failed = True
+                    break
+                self.store.mark_forwarded(last_id)
+                sent += count
+            if failed:
+                break
+        self.forwarded += sent
+        return sent
+
+    def _post(self, payload):
+        self.requests += 1
+        try:
+            response = self.sender.post_json(self.url, payload)
+            ok = response.status_code == 200
+            self.last_error = None if ok else f"HTTP {response.status_code}"
+        except Exception as e:
+            ok = False
+            self.last_error = str(e)
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        return ok
+
+    def start(self):
+        def run():
+            while not self._stop.is_set():
+                self._wake.wait(max(self.interval, self.breaker.seconds_until_retry()))
+                self._wake.clear()
+                try:
+                    self.forward_once()
+                except Exception as e:
+                    self.last_error = str(e)
+
+        self._thread = threading.Thread(target=run, name="ingest-forwarder", daemon=True)
+        self._thread.start()
+        return self
+
+    def flush(self):
+        """Ask the forwarder to run now instead of waiting for the interval."""
+        self._wake.set()
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+# --- HTTP Server ---
+
+class IngestServer:
+    def __init__(self, db_path, forward_url="", sender=None, host="127.0.0.1", port=0,
+                 forward_batch=500, forward_interval=30.0, forward_bulk=True):
+        self.store = IngestStore(db_path)
+        self.forwarder = None
+        if forward_url:
+            if sender is None:
+                from core.sender import HttpSender
+                # ชีตไม่ตัดแถวซ้ำ: POST ที่ timeout ห้ามส่งซ้ำอัตโนมัติ
+                sender = HttpSender(pool_size=1, max_workers=1, read_timeout=60, retry_posts=False)
+            self.forwarder = Forwarder(self.store, forward_url, sender, forward_batch, forward_interval,
+                                       bulk=forward_bulk)
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/exec"
+
+    def handle_post(self, headers, body):
+        with self._lock:
+            self.requests += 1
+        try:
+            events = decode_body(body, headers)
+        except Exception:
+            return 400, {"status": "bad payload"}
+        rows = []
+        for n, e in enumerate(events):
+            try:
+                rows.append(clean_event(e))
+            except ValueError as err:
+                # ปฏิเสธทั้ง batch ให้ client แบ่งครึ่งจนเจอแถวเสียแล้วย้ายไป dead letter
+                return 400, {"status": "bad event", "index": n, "error": str(err)}
+        try:
+            accepted, inserted, duplicates = self.store.ingest(rows)
+        except sqlite3.Error as err:
+            return 503, {"status": "error", "error": str(err)}
+        return 200, {"status": "success", "count": inserted, "accepted": accepted, "duplicates": duplicates}
+
+    def handle_get(self, path, query):
+        if path == "/totals":
+            date = query.get("date") or datetime.now().strftime("%Y-%m-%d")
+            employee = query.get("employee")
+            totals = self.store.totals(date, employee)
+            if employee is not None:
+                return 200, {"employees_name": employee, "date": date, "counts": totals.get(employee, {})}
+            return 200, {"date": date, "employees": totals}
+        if path in ("/", "/health"):
+            forwarder = self.forwarder
+            return 200, {"status": "ok", "events": self.store.event_count(),
+                         "pending_forward": self.store.pending_forward(), "requests": self.requests,
+                         "forwarded": forwarder.forwarded if forwarder else 0,
+                         "forward_error": forwarder.last_error if forwarder else None}
+        return 404, {"status": "not found"}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body):
+                data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                # บอก client ว่าส่งแบบ gzip มาได้
+                self.send_header("Accept-Encoding", "gzip")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                self._reply(*server.handle_post(self.headers, body))
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                self._reply(*server.handle_get(parsed.path.rstrip("/") or "/", query))
+
+        return Handler
+
+    def start(self):
+        if self.forwarder is not None:
+            self.forwarder.start()
+        self._thread = threading.Thread(target=self._server.serve_forever, name="ingest-http", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self.forwarder is not None:
+            self.forwarder.stop()
+            # ส่งของที่ค้างอีกรอบก่อนปิด
+            self.forwarder.forward_once()
+        self.store.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1", help="0.0.0.0 to accept clients from the LAN")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--db", default="ingest.db", help="SQLite buffer file")
+    parser.add_argument("--forward-url", default="", help="Apps Script web app URL; empty = buffer only")
+    parser.add_argument("--forward-batch", type=int, default=500)
+    parser.add_argument("--forward-interval", type=float, default=30.0, help="seconds between forward runs")
+    parser.add_argument("--forward-single", action="store_true",
+                        help="one POST per event, for a sheet without tools/sheet_bulk_handler.gs")
+    args = parser.parse_args(argv)
+
+    server = IngestServer(os.path.abspath(args.db), args.forward_url, host=args.host, port=args.port,
+                          forward_batch=args.forward_batch, forward_interval=args.forward_interval,
+                          forward_bulk=not args.forward_single).start()
+    print(f"Ingest server listening on {server.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,68 +1,26 @@
+import time
+PROCESS_STARTED = time.perf_counter() # จุดเริ่มนับเวลา startup (ก่อน import อื่นๆ)
 import tkinter as tk
 from tkinter import messagebox, ttk
-import json
 import os
 import sys
-import subprocess
-import requests
 import threading
-import time
 from datetime import datetime
-import pystray
-from PIL import Image, ImageDraw
-import win32gui 
-import win32process
 import shutil
 import traceback # Import สำหรับการแกะรอย Error
-
-# --- Resource Helper ---
-def resource_path(relative_path):
-    try:
-        base_path = sys._MEIPASS
-    except Exception:
-        base_path = os.path.abspath(".")
-    return os.path.join(base_path, relative_path)
-
-# --- Bootstrapping App Info ---
-BUNDLED_CONFIG_FILE = resource_path("config.json")
-
-def load_bootstrap_info():
-    info = {
-        "app_name": "ClickCounterApp",
-        "version": "1.0.0",
-        "update_check_url": ""
-    }
-    if os.path.exists(BUNDLED_CONFIG_FILE):
-        try:
-            with open(BUNDLED_CONFIG_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                info["app_name"] = data.get("app_name", info["app_name"])
-                info["version"] = data.get("version", info["version"])
-                info["update_check_url"] = data.get("update_check_url", info["update_check_url"])
-        except Exception as e:
-            pass
-    return info
-
-BOOTSTRAP_INFO = load_bootstrap_info()
-APP_NAME = BOOTSTRAP_INFO["app_name"]
-VERSION = BOOTSTRAP_INFO["version"]
-UPDATE_CHECK_URL = BOOTSTRAP_INFO["update_check_url"]
-
-# --- Path Management ---
-def get_app_data_path(filename):
-    app_data = os.getenv('LOCALAPPDATA')
-    config_dir = os.path.join(app_data, APP_NAME)
-    if not os.path.exists(config_dir):
-        try:
-            os.makedirs(config_dir)
-        except OSError:
-            pass 
-    return os.path.join(config_dir, filename)
-
-USER_CONFIG_FILE = get_app_data_path("config.json")
-STATS_FILE = get_app_data_path("stats.json")
-QUEUE_FILE = get_app_data_path("queue.json")
-LOG_FILE = get_app_data_path("error.log") # ไฟล์เก็บ Log
+from core.paths import resource_path, data_path
+from core.config import bootstrap_info, load_config, save_config, save_config_later
+from core.offline_queue import open_backend, open_counters, open_outbox, write_dead_letter, compactor_thread
+from core.sender import sender_from_config
+from core.syncengine import SyncEngine, channels_from_config
+from core.pipeline import ClickPipeline
+from core.focus import FocusMatcher, create_focus_watcher
+from core.updater import fetch_release, install_update, updates_dir
+from core.telemetry import metrics, telemetry_from_config
+from core.remoteconfig import TeamConfigSync
+from core.rollup import open_rollup
+from core.startup import StartupScheduler
+# pystray และ PIL ถูก import ตอนใช้งานจริงเท่านั้น (เปิดโปรแกรมเร็วขึ้น)
 
 # --- Error Logging System (New Feature) ---
 def log_exception(exc_type, exc_value, exc_traceback):
@@ -70,136 +28,65 @@ def log_exception(exc_type, exc_value, exc_traceback):
     ฟังก์ชันนี้จะทำงานอัตโนมัติเมื่อโปรแกรมเจอ Error ที่ไม่ได้ดักจับ (Crash)
     มันจะบันทึกรายละเอียดลงไฟล์ error.log และแจ้งเตือนผู้ใช้
     """
+    log_file = data_path("error.log") # ไฟล์เก็บ Log
     # 1. แปลง Error เป็นข้อความ
     error_msg = "".join(traceback.format_exception(exc_type, exc_value, exc_traceback))
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
     # 2. บันทึกลงไฟล์
     try:
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(f"\n[{timestamp}] CRITICAL ERROR (Version {VERSION}):\n{error_msg}\n{'-'*40}\n")
+        with open(log_file, "a", encoding="utf-8") as f:
+            f.write(f"\n[{timestamp}] CRITICAL ERROR (Version {bootstrap_info()['version']}):\n{error_msg}\n{'-'*40}\n")
     except:
         pass # ถ้าเขียนไฟล์ไม่ได้จริงๆ ก็ปล่อยผ่าน
+    metrics.error("Unhandled exception", detail=str(exc_value))
 
     # 3. แจ้งเตือนผู้ใช้
     error_short = str(exc_value)
     messagebox.showerror("Critical Error", 
                          f"An unexpected error occurred:\n{error_short}\n\n"
-                         f"Please check the log file at:\n{LOG_FILE}")
-
-# Hook ระบบ Error ของ Python ให้มาลงที่ฟังก์ชันของเรา
-sys.excepthook = log_exception
-
-
-# --- Config Management ---
-def load_config():
-    default_config = {
-        "employees_name": "Unknown Employee", 
-        "gas_url": "https://script.google.com/macros/s/AKfycbyyN39lbyWLoSzs5NkT70b-ZAga9NXCag8C-D7DXNXsaoviP_hcR2fUJKTfaoC1PFHa/exec",
-        "is_locked": False,
-        "auto_hide_whatsapp": False,
-        "geometry": "60x140+100+100",
-        "menus": {
-            "actions": ["Clients Called"],
-            "wins": ["Clients Booked"]
-        },
-        "categories": ["Unspecified"]
-    }
-
-    if os.path.exists(BUNDLED_CONFIG_FILE):
-        try:
-            with open(BUNDLED_CONFIG_FILE, "r", encoding="utf-8") as f:
-                bundled_conf = json.load(f)
-                default_config.update(bundled_conf)
-        except:
-            pass
-
-    user_config = {}
-    if os.path.exists(USER_CONFIG_FILE):
-        try:
-            with open(USER_CONFIG_FILE, "r", encoding="utf-8") as f:
-                user_config = json.load(f)
-        except:
-            pass
-    
-    final_config = default_config.copy()
-    final_config.update(user_config)
-    
-    if "user_name" in user_config and "employees_name" not in user_config:
-        final_config["employees_name"] = user_config["user_name"]
+                         f"Please check the log file at:\n{log_file}")
 
-    if "menus" not in user_config:
-        final_config["menus"] = default_config["menus"]
-    if "categories" not in user_config:
-        final_config["categories"] = default_config["categories"]
+# --- HTTP Sender ---
+_sender = None
+_sender_lock = threading.Lock()
 
-    return final_config
-
-def save_config(config):
-    try:
-        with open(USER_CONFIG_FILE, "w", encoding="utf-8") as f:
-            json.dump(config, f, ensure_ascii=False, indent=4)
-    except Exception as e:
-        # Log error เล็กน้อยถ้า Save ไม่ได้ (ไม่ถึงกับ Crash)
-        print(f"Error saving config: {e}")
-
-# --- Stats Management ---
-def load_stats():
-    today_str = datetime.now().strftime("%Y-%m-%d")
-    default_stats = {"date": today_str, "counts": {}}
-    
-    if os.path.exists(STATS_FILE):
-        try:
-            with open(STATS_FILE, "r", encoding="utf-8") as f:
-                stats = json.load(f)
-                if stats.get("date") != today_str:
-                    return default_stats
-                return stats
-        except:
-            pass
-    return default_stats
-
-def save_stats(stats):
-    try:
-        with open(STATS_FILE, "w", encoding="utf-8") as f:
-            json.dump(stats, f, ensure_ascii=False, indent=4)
-    except Exception as e:
-        print(f"Error saving stats: {e}")
+def init_sender(config):
+    global _sender
+    with _sender_lock:
+        if _sender is None:
+            _sender = sender_from_config(config)
+        return _sender
 
 # --- Offline Queue Management ---
-def add_to_queue(data):
-    queue = []
-    if os.path.exists(QUEUE_FILE):
-        try:
-            with open(QUEUE_FILE, "r", encoding="utf-8") as f:
-                queue = json.load(f)
-        except:
-            pass
-    queue.append(data)
-    with open(QUEUE_FILE, "w", encoding="utf-8") as f:
-        json.dump(queue, f, ensure_ascii=False, indent=4)
-
-def process_queue_thread(gas_url):
-    while True:
-        if os.path.exists(QUEUE_FILE):
-            queue = []
-            try:
-                with open(QUEUE_FILE, "r", encoding="utf-8") as f:
-                    queue = json.load(f)
-            except:
-                pass
-            
-            if queue and gas_url:
-                data = queue[0]
-                try:
-                    response = requests.post(gas_url, json=data, timeout=10)
-                    if response.status_code == 200:
-                        queue.pop(0)
-                        with open(QUEUE_FILE, "w", encoding="utf-8") as f:
-                            json.dump(queue, f, ensure_ascii=False, indent=4)
-                except:
-                    pass
-        time.sleep(10)
+_queue = None
+_queue_lock = threading.Lock()
+
+def init_queue(config):
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = open_backend(config)
+        return _queue
+
+def get_queue():
+    return init_queue({})
+
+# --- Sync Engine ---
+_engine = None
+_engine_lock = threading.Lock()
+
+def init_engine(config):
+    # หนึ่ง event loop ส่งทุกคิวไปทุก endpoint (gas_url + extra_gas_urls)
+    global _engine
+    sender = init_sender(config) # สร้าง sender ก่อนถือ lock ของ engine (Lock ไม่ reentrant)
+    with _engine_lock:
+        if _engine is None:
+            _engine = SyncEngine(sender, endpoint_concurrency=config.get("endpoint_concurrency", 2))
+            for channel in channels_from_config(config, init_queue(config), sender,
+                                                dead_letter=write_dead_letter, open_journal=open_outbox):
+                _engine.add_channel(channel)
+        return _engine
 
 # --- Modern Button Class ---
 class ModernButton(tk.Button):
@@ -222,8 +109,16 @@ class ModernButton(tk.Button):
 class ClickCounterApp:
     def __init__(self, root):
         self.root = root
+        self.startup = StartupScheduler(root, started=PROCESS_STARTED)
         self.config = load_config()
-        self.stats = load_stats()
+        telemetry_from_config(self.config, log_path=data_path("telemetry.log"))
+        self.sender = init_sender(self.config)
+        queue = init_queue(self.config)
+        self.engine = init_engine(self.config)
+        counters = open_counters(queue, self.config.get("stats_autosave_seconds", 5))
+        self.rollup = open_rollup(queue)
+        self.pipeline = ClickPipeline(self.config, counters, queue, self.engine, rollup=self.rollup).start()
+        self.stats_window = None
         
         self.is_locked = self.config.get("is_locked", False)
         self.auto_hide_whatsapp = self.config.get("auto_hide_whatsapp", False)
@@ -237,8 +132,13 @@ class ClickCounterApp:
         # Variables
         self.current_popup = None
         self.active_menu_name = None
+        self.popup_cache = {}
+        self.popup_latency_hook = None # callable(menu_name, seconds) สำหรับวัดความเร็วเปิด popup
+        self.last_popup_latency = None
         self.last_popup_close_time = 0
         self.is_visible = True
+        self.focus_watcher = None
+        self.focus_matcher = FocusMatcher(self.config.get("auto_hide_keywords", ["whatsapp", "line"]))
         
         # Window Setup
         self.root.overrideredirect(True)
@@ -262,14 +162,57 @@ class ClickCounterApp:
 
         # UI Setup
         self.setup_ui()
+        self.startup.mark("ui_built")
         
-        # Threads
-        threading.Thread(target=self.setup_system_tray, daemon=True).start()
-        threading.Thread(target=self.monitor_focus, daemon=True).start()
-        if self.config.get("gas_url"):
-            threading.Thread(target=process_queue_thread, args=(self.config["gas_url"],), daemon=True).start()
-        if UPDATE_CHECK_URL:
-            threading.Thread(target=self.check_for_updates, daemon=True).start()
+        # ส่วนที่เหลือเริ่มหลังหน้าต่างขึ้นจอแล้ว ทีละ stage
+        self.team_sync = None
+        self.startup.expect("first_frame", "stages_done", "tray")
+        self.startup.add_stage("sync_engine", self.start_sync_engine)
+        self.startup.add_stage("tray_thread", lambda: threading.Thread(target=self.setup_system_tray, daemon=True).start())
+        self.startup.add_stage("focus_watcher", self.apply_auto_hide)
+        self.startup.add_stage("background_checks", self.start_background_checks)
+        self.startup.run()
+
+    def start_sync_engine(self):
+        self.engine.start()
+        for channel in self.engine.channel_list():
+            threading.Thread(target=compactor_thread, args=(channel.queue,), daemon=True).start()
+
+    def start_background_checks(self):
+        # ทุกเครื่องเปิดพร้อมกันตอน 9 โมง: สุ่มเวลาเช็กอัปเดตให้กระจายออกไป
+        if bootstrap_info()["update_check_url"]:
+            self.startup.jittered("update_check", self.check_for_updates,
+                                  self.config.get("update_check_jitter_seconds", 600))
+        if self.config.get("team_config_url"):
+            # snapshot ถูกใช้ไปแล้วตอน load_config; ตรงนี้แค่ถามว่ามีของใหม่ไหม (ส่วนใหญ่ได้ 304)
+            self.team_sync = TeamConfigSync(
+                self.config["team_config_url"], self.sender,
+                lambda values: self.root.after(0, self.apply_team_config, values),
+                interval=self.config.get("team_config_poll_seconds", 300))
+            self.startup.jittered("team_config", self.team_sync.start,
+                                  self.config.get("team_config_jitter_seconds", 60))
+
+    def apply_team_config(self, values):
+        """Apply a changed team config to the running app (Tk thread)."""
+        changed = {k: v for k, v in values.items() if self.config.get(k) != v}
+        if not changed:
+            return
+        self.config.update(changed)
+        if "menus" in changed or "categories" in changed:
+            cats = self.config.get("categories") or ["Unspecified"]
+            if self.persistent_category.get() not in cats:
+                self.persistent_category.set(cats[0])
+            self.invalidate_popups()
+        if "auto_hide_keywords" in changed:
+            self.focus_matcher = FocusMatcher(self.config["auto_hide_keywords"])
+        if "extra_gas_urls" in changed:
+            # gas_url หลักอ่านจาก config สดอยู่แล้ว; endpoint ใหม่ต้องเพิ่ม channel
+            for channel in channels_from_config(self.config, get_queue(), self.sender, dead_letter=write_dead_letter,
+                                                open_journal=open_outbox,
+                                                skip={c.name for c in self.engine.channel_list()}):
+                self.engine.add_channel(channel)
+                threading.Thread(target=compactor_thread, args=(channel.queue,), daemon=True).start()
+        save_config_later(self.config)
 
     def clickwin(self, event):
         self._offsetx = event.x
@@ -286,9 +229,11 @@ class ClickCounterApp:
         current_geo = self.root.geometry()
         if current_geo != self.config.get("geometry"):
             self.config["geometry"] = current_geo
-            save_config(self.config)
+            # ลาก/ย่อขยายหลายครั้งติดกัน เขียนไฟล์ครั้งเดียว
+            save_config_later(self.config)
 
     def setup_ui(self):
+        self.root.option_add('*TCombobox*Listbox.font', ("Arial", 11))
         self.root.columnconfigure(0, weight=1)
         self.root.rowconfigure(0, weight=1)
         self.root.rowconfigure(1, weight=1)
@@ -316,73 +261,88 @@ class ClickCounterApp:
     # --- Updater ---
     def check_for_updates(self):
         try:
-            response = requests.get(UPDATE_CHECK_URL, timeout=5)
+            response = self.sender.get(bootstrap_info()["update_check_url"], timeout=5)
             if response.status_code == 200:
                 data = response.json()
-                if data.get("version") and data.get("version") > VERSION:
-                    self.root.after(0, lambda: self.prompt_update(data.get("version"), data.get("url")))
+                if data.get("version") and data.get("version") > bootstrap_info()["version"]:
+                    self.root.after(0, lambda: self.prompt_update(data))
         except:
             pass
 
-    def prompt_update(self, version, url):
-        if messagebox.askyesno("Update Available", f"New version {version} available.\nUpdate now?"):
-            threading.Thread(target=self.perform_update, args=(url,), daemon=True).start()
-
-    def perform_update(self, url):
+    def prompt_update(self, release):
+        if messagebox.askyesno("Update Available", f"New version {release['version']} available.\nUpdate now?"):
+            progress = self.show_update_progress()
+            threading.Thread(target=self.perform_update, args=(release, progress), daemon=True).start()
+
+    def show_update_progress(self):
+        win = tk.Toplevel(self.root)
+        win.title("Updating")
+        win.attributes("-topmost", True)
+        win.resizable(False, False)
+        label = tk.Label(win, text="Downloading update...", font=("Segoe UI", 9))
+        label.pack(padx=15, pady=(10, 5))
+        bar = ttk.Progressbar(win, length=240, mode="determinate", maximum=100)
+        bar.pack(padx=15, pady=(0, 12))
+        last = [0.0]
+
+        def report(done, total):
+            # เรียกจาก thread ดาวน์โหลด: อัปเดต UI ไม่เกิน ~10 ครั้ง/วินาที
+            now = time.monotonic()
+            if now - last[0] < 0.1 and done != total:
+                return
+            last[0] = now
+            text = f"Downloading update... {done // 1024:,} KB"
+            if total:
+                text += f" / {total // 1024:,} KB"
+            self.root.after(0, lambda: (label.config(text=text), bar.config(value=done * 100 / total if total else 0)))
+
+        report.window = win
+        return report
+
+    def perform_update(self, release, progress=None):
         try:
-            new_exe_name = "ClickCounter_new.exe"
-            response = requests.get(url, stream=True)
-            with open(new_exe_name, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            current_exe = sys.executable
-            batch_script = f"""
-@echo off
-timeout /t 1 /nobreak > NUL
-taskkill /F /PID {os.getpid()}
-del "{current_exe}"
-ren "{new_exe_name}" "{os.path.basename(current_exe)}"
-start "" "{current_exe}"
-del "%~f0"
-            """
-            with open("update.bat", "w") as f:
-                f.write(batch_script)
-            subprocess.Popen("update.bat", shell=True)
-            self.root.quit()
-        except:
-            pass
+            new_exe = os.path.join(updates_dir(), f"ClickCounter-{release['version']}.exe")
+            # exe ที่รันอยู่ใช้เป็นต้นฉบับของ patch ได้เฉพาะตอนเป็น build ของ PyInstaller
+            current_exe = sys.executable if getattr(sys, "frozen", False) else None
+            fetch_release(self.sender, release, bootstrap_info()["version"], current_exe, new_exe,
+                          chunk_size=self.config.get("update_chunk_bytes", 1024 * 1024), progress=progress)
+            install_update(new_exe)
+            self.root.after(0, self.close_app)
+        except Exception as e:
+            message = f"{e}\n\nThe download will resume next time."
+            if progress is not None:
+                self.root.after(0, progress.window.destroy)
+            self.root.after(0, lambda: messagebox.showerror("Update Failed", message))
 
     # --- Focus Monitoring ---
-    def monitor_focus(self):
-        while True:
-            if self.auto_hide_whatsapp:
-                try:
-                    hwnd = win32gui.GetForegroundWindow()
-                    title = win32gui.GetWindowText(hwnd).lower()
-                    is_target_app = "whatsapp" in title or "line" in title
-                    try:
-                        _, pid = win32process.GetWindowThreadProcessId(hwnd)
-                        is_me = (pid == os.getpid())
-                    except:
-                        is_me = False
-                    should_show = is_target_app or is_me
-                    if should_show and not self.is_visible:
-                        self.root.after(0, self.root.deiconify)
-                        if self.current_popup:
-                            self.root.after(0, self.current_popup.deiconify)
-                        self.is_visible = True
-                    elif not should_show and self.is_visible:
-                        self.root.after(0, self.root.withdraw)
-                        if self.current_popup:
-                            self.root.after(0, self.current_popup.withdraw)
-                        self.is_visible = False
-                except:
-                    pass
-            else:
-                if not self.is_visible:
-                    self.root.after(0, self.root.deiconify)
-                    self.is_visible = True
-            time.sleep(0.5)
+    def apply_auto_hide(self):
+        # เปิด watcher เฉพาะตอนเปิดใช้ auto-hide (ปิดแล้วไม่มีอะไรทำงานเบื้องหลัง)
+        if self.auto_hide_whatsapp and self.focus_watcher is None:
+            self.focus_watcher = create_focus_watcher(self.on_foreground_changed).start()
+        elif not self.auto_hide_whatsapp and self.focus_watcher is not None:
+            self.focus_watcher.stop()
+            self.focus_watcher = None
+            self.set_visible(True)
+
+    def on_foreground_changed(self, hwnd, pid, title):
+        # เรียกจาก thread ของ watcher เมื่อหน้าต่างด้านหน้าเปลี่ยน
+        if not self.auto_hide_whatsapp:
+            return
+        should_show = self.focus_matcher.should_show(hwnd, pid, title)
+        if should_show != self.is_visible:
+            self.is_visible = should_show
+            self.root.after(0, self.set_visible, should_show)
+
+    def set_visible(self, visible):
+        self.is_visible = visible
+        if visible:
+            self.root.deiconify()
+            if self.current_popup:
+                self.current_popup.deiconify()
+        else:
+            self.root.withdraw()
+            if self.current_popup:
+                self.current_popup.withdraw()
 
     def start_resize(self, event):
         self._resize_start_x = event.x_root
@@ -413,66 +373,44 @@ del "%~f0"
             # ถ้าเป็น error ที่ไม่ได้ handle โดย hook จะถูกจับที่นี่ แต่ถ้า crash เลยจะไปที่ hook
             self.close_popup()
 
-    def show_popup(self, menu_name):
+    def popup_signature(self, menu_name):
+        # เปลี่ยนเมื่อ config["menus"] หรือ categories เปลี่ยน -> ต้องสร้าง popup ใหม่
+        items_list = tuple(self.config.get("menus", {}).get(menu_name.lower(), []))
+        return items_list, tuple(self.config.get("categories", ["Unspecified"]))
+
+    def invalidate_popups(self):
         self.close_popup()
-        
+        for cached in self.popup_cache.values():
+            try:
+                cached["window"].destroy()
+            except:
+                pass
+        self.popup_cache = {}
+
+    def build_popup(self, menu_name):
+        """Build a menu popup once; later opens only reposition it and refresh the counts."""
         popup = tk.Toplevel(self.root)
+        popup.withdraw()
         popup.overrideredirect(True)
         popup.attributes("-topmost", True)
         popup.config(bg="white", bd=1, relief="solid")
-        
-        self.root.update_idletasks()
-        root_x = self.root.winfo_rootx()
-        root_y = self.root.winfo_rooty()
-        root_w = self.root.winfo_width()
-        root_h = self.root.winfo_height()
-        
-        screen_w = self.root.winfo_screenwidth()
-        popup_width = 300
-        
-        items_list = self.config.get("menus", {}).get(menu_name.lower(), [])
-        
-        header_height = 40
-        item_height = 45 
-        input_area_height = 180 
-        
-        popup_height = header_height + (len(items_list) * item_height) + input_area_height
-        
-        if root_x + root_w + popup_width > screen_w:
-            pos_x = root_x - popup_width - 5
-        else:
-            pos_x = root_x + root_w + 5
-            
-        if menu_name == "Actions":
-            pos_y = root_y
-        else:
-            pos_y = root_y + (root_h // 2)
 
-        screen_h = self.root.winfo_screenheight()
-        if pos_y + popup_height > screen_h:
-            pos_y = screen_h - popup_height - 10
-
-        pos_y = max(0, pos_y)
-        popup.geometry(f"{popup_width}x{popup_height}+{int(pos_x)}+{int(pos_y)}")
+        items_list = self.config.get("menus", {}).get(menu_name.lower(), [])
 
         tk.Label(popup, text=menu_name.upper(), bg="white", fg="#7f8c8d", 
                  font=("Arial", 12, "bold"), pady=8).pack(fill=tk.X)
 
-        self.stats = load_stats()
-
         items_frame = tk.Frame(popup, bg="white")
         items_frame.pack(fill=tk.BOTH, expand=True, padx=0, pady=0)
 
+        rows = []
         for item in items_list:
             row_frame = tk.Frame(items_frame, bg="white")
             row_frame.pack(fill=tk.X, padx=0, pady=2) 
 
-            count = self.stats["counts"].get(item, 0)
             color = "#3498db" if menu_name == "Actions" else "#27ae60"
             
-            btn_text = f"{item} ({count})"
-            
-            btn_main = tk.Button(row_frame, text=btn_text, bg="white", fg="black", bd=0, anchor="w",
+            btn_main = tk.Button(row_frame, text=item, bg="white", fg="black", bd=0, anchor="w",
                                 font=("Arial", 10),
                                 activebackground=color, activeforeground="white", padx=10, pady=8,
                                 command=lambda i=item: [self.log_data(menu_name, i, 1), self.close_popup()])
@@ -494,6 +432,7 @@ del "%~f0"
             btn_main.bind("<Enter>", on_enter_row)
             btn_main.bind("<Leave>", on_leave_row)
             btn_neg.bind("<Enter>", on_enter_row)
+            rows.append((item, btn_main, on_leave_row))
 
         bottom_container = tk.Frame(popup, bg="white")
         bottom_container.pack(side=tk.BOTTOM, fill=tk.X, padx=0, pady=0)
@@ -511,16 +450,84 @@ del "%~f0"
         tk.Label(input_frame, text="Category:", bg="white", fg="#7f8c8d", font=("Arial", 10)).pack(anchor="w", pady=(0,2))
         cat_values = self.config.get("categories", ["Unspecified"])
         
-        self.root.option_add('*TCombobox*Listbox.font', ("Arial", 11))
-        
         cat_combo = ttk.Combobox(input_frame, textvariable=self.persistent_category, 
                                  values=cat_values, state="readonly", font=("Arial", 10))
         cat_combo.pack(fill=tk.X, pady=(0, 5), ipady=3)
 
+        return {
+            "window": popup,
+            "signature": self.popup_signature(menu_name),
+            "rows": rows,
+            "labels": {},
+        }
+
+    def show_popup(self, menu_name):
+        started = time.perf_counter()
+        self.close_popup()
+
+        cached = self.popup_cache.get(menu_name)
+        if cached is None or cached["signature"] != self.popup_signature(menu_name):
+            if cached is not None:
+                cached["window"].destroy()
+            cached = self.popup_cache[menu_name] = self.build_popup(menu_name)
+        popup = cached["window"]
+
+        # อัปเดตเฉพาะตัวเลข (ไม่สร้าง widget ใหม่)
+        for idx, (item, btn_main, reset_row) in enumerate(cached["rows"]):
+            btn_text = f"{item} ({self.pipeline.counters.get(item)})"
+            if cached["labels"].get(idx) != btn_text:
+                btn_main.config(text=btn_text)
+                cached["labels"][idx] = btn_text
+            reset_row(None)
+        
+        self.root.update_idletasks()
+        root_x = self.root.winfo_rootx()
+        root_y = self.root.winfo_rooty()
+        root_w = self.root.winfo_width()
+        root_h = self.root.winfo_height()
+        
+        screen_w = self.root.winfo_screenwidth()
+        popup_width = 300
+        
+        header_height = 40
+        item_height = 45 
+        input_area_height = 180 
+        
+        popup_height = header_height + (len(cached["rows"]) * item_height) + input_area_height
+        
+        if root_x + root_w + popup_width > screen_w:
+            pos_x = root_x - popup_width - 5
+        else:
+            pos_x = root_x + root_w + 5
+            
+        if menu_name == "Actions":
+            pos_y = root_y
+        else:
+            pos_y = root_y + (root_h // 2)
+
+        screen_h = self.root.winfo_screenheight()
+        if pos_y + popup_height > screen_h:
+            pos_y = screen_h - popup_height - 10
+
+        pos_y = max(0, pos_y)
+        popup.geometry(f"{popup_width}x{popup_height}+{int(pos_x)}+{int(pos_y)}")
+
+        popup.deiconify()
         popup.lift()
         self.current_popup = popup
         self.active_menu_name = menu_name
         popup.after(300, lambda: self._safe_bind_focus(popup))
+        # วัดเวลาจากกดปุ่มจนหน้าต่างวาดเสร็จ (after_idle ทำงานหลังวาดจอ)
+        popup.after_idle(lambda: self.report_popup_latency(menu_name, time.perf_counter() - started))
+
+    def report_popup_latency(self, menu_name, seconds):
+        self.last_popup_latency = seconds
+        metrics.observe("show_popup", seconds, menu=menu_name)
+        if self.popup_latency_hook:
+            try:
+                self.popup_latency_hook(menu_name, seconds)
+            except:
+                pass
 
     def _safe_bind_focus(self, popup):
         if self.current_popup == popup:
@@ -539,32 +546,21 @@ del "%~f0"
         if self.current_popup:
             self.last_popup_close_time = time.time()
             try:
-                self.current_popup.destroy()
+                # ซ่อนไว้ใช้ซ้ำ แทนการ destroy แล้วสร้างใหม่ทุกครั้ง
+                self.current_popup.unbind("<FocusOut>")
+                self.current_popup.withdraw()
             except:
                 pass
             self.current_popup = None
             self.active_menu_name = None
 
     def log_data(self, menu, action, count_val):
-        current_count = self.stats["counts"].get(action, 0)
-        new_count = current_count + count_val
-        self.stats["counts"][action] = new_count
-        save_stats(self.stats)
-
-        now = datetime.now()
-        data = {
-            "date": now.strftime("%Y-%m-%d"),
-            "timestamp": now.strftime("%H:%M:%S"),
-            "employees_name": self.config.get("employees_name", "Unknown"), 
-            "works_type": menu,   
-            "works_detail": action, 
-            "counts": count_val,
-            "client_name": self.persistent_client_name.get(),
-            "events_category": self.persistent_category.get() 
-        }
-        
-        self.blink_effect(count_val)
-        threading.Thread(target=self.send_or_queue, args=(data,), daemon=True).start()
+        # ทำงานบน Tk thread: แก้แค่ตัวเลขในหน่วยความจำ ส่วนการเขียนไฟล์/ส่งเน็ตให้ pipeline จัดการ
+        with metrics.timer("log_data"):
+            self.pipeline.log(menu, action, count_val,
+                              client_name=self.persistent_client_name.get(),
+                              category=self.persistent_category.get())
+            self.blink_effect(count_val)
 
     def blink_effect(self, count_val):
         original_bg = self.root["bg"]
@@ -572,21 +568,10 @@ del "%~f0"
         self.root.config(bg=color)
         self.root.after(200, lambda: self.root.config(bg=original_bg))
 
-    def send_or_queue(self, data):
-        url = self.config.get("gas_url", "")
-        if not url:
-            return
-        success = False
-        try:
-            response = requests.post(url, json=data, timeout=5)
-            if response.status_code == 200:
-                success = True
-        except:
-            pass
-        if not success:
-            add_to_queue(data)
-
     def setup_system_tray(self):
+        import pystray
+        from PIL import Image, ImageDraw
+
         # พยายามโหลดรูป icon.ico ที่เตรียมไว้
         icon_path = resource_path("icon.ico")
         image = None
@@ -612,24 +597,33 @@ del "%~f0"
             self.auto_hide_whatsapp = not self.auto_hide_whatsapp
             self.config["auto_hide_whatsapp"] = self.auto_hide_whatsapp
             save_config(self.config)
+            self.root.after(0, self.apply_auto_hide)
 
         def on_settings(icon, item):
             self.root.after(0, self.open_settings)
 
+        def on_stats(icon, item):
+            self.root.after(0, self.open_stats)
+
         def on_exit(icon, item):
             icon.stop()
             self.root.after(0, self.close_app)
 
         menu = pystray.Menu(
-            pystray.MenuItem(f'Version {VERSION}', lambda i, k: None, enabled=False),
+            pystray.MenuItem(f'Version {bootstrap_info()["version"]}', lambda i, k: None, enabled=False),
+            pystray.MenuItem('Stats', on_stats),
             pystray.MenuItem('Settings', on_settings),
             pystray.MenuItem('Lock Position', on_toggle_lock, checked=lambda item: self.is_locked),
             pystray.MenuItem('Auto-hide (WhatsApp/LINE)', on_toggle_auto_hide, checked=lambda item: self.auto_hide_whatsapp),
             pystray.MenuItem('Exit', on_exit)
         )
 
+        def on_ready(icon):
+            icon.visible = True
+            self.startup.mark("tray")
+
         self.tray_icon = pystray.Icon("click_counter", image, "Click Counter", menu)
-        self.tray_icon.run()
+        self.tray_icon.run(setup=on_ready)
 
     def open_settings(self):
         settings_win = tk.Toplevel(self.root)
@@ -655,13 +649,79 @@ del "%~f0"
             
         tk.Button(settings_win, text="Save", command=save_and_close).pack(pady=20)
 
+    # --- Stats View ---
+    def open_stats(self):
+        # อ่านจาก rollup ในหน่วยความจำล้วนๆ ไม่แตะฐานข้อมูล เปิดได้ทันทีแม้มีข้อมูลหลายเดือน
+        if self.stats_window is not None and self.stats_window.winfo_exists():
+            self.stats_window.lift()
+            return
+        win = tk.Toplevel(self.root)
+        win.title("Stats")
+        win.geometry("340x420")
+        win.attributes("-topmost", True)
+        win.config(bg="white")
+        self.stats_window = win
+
+        summary_label = tk.Label(win, bg="white", justify="left", anchor="w", font=("Arial", 10))
+        summary_label.pack(fill="x", padx=10, pady=(10, 0))
+        tk.Label(win, text="Last 12 hours", bg="white", fg="#7f8c8d", font=("Arial", 8, "bold")).pack(anchor="w", padx=10, pady=(8, 0))
+        hours_canvas = tk.Canvas(win, width=320, height=90, bg="white", highlightthickness=0)
+        hours_canvas.pack(padx=10)
+        tk.Label(win, text="Last 14 days", bg="white", fg="#7f8c8d", font=("Arial", 8, "bold")).pack(anchor="w", padx=10, pady=(8, 0))
+        days_canvas = tk.Canvas(win, width=320, height=90, bg="white", highlightthickness=0)
+        days_canvas.pack(padx=10)
+
+        def percent(value):
+            return f"{value * 100:.1f}%" if value is not None else "-"
+
+        def bars(canvas, calls, wins):
+            canvas.delete("all")
+            width, height = int(canvas["width"]), int(canvas["height"])
+            peak = max(calls + wins + [1])
+            step = width / len(calls)
+            for i, (c, w) in enumerate(zip(calls, wins)):
+                x = i * step
+                canvas.create_rectangle(x + 1, height - max(0, c) * (height - 12) / peak, x + step * 0.55, height,
+                                        fill="#2980b9", width=0)
+                canvas.create_rectangle(x + step * 0.55, height - max(0, w) * (height - 12) / peak, x + step - 1, height,
+                                        fill="#f39c12", width=0)
+            canvas.create_text(width - 2, 2, anchor="ne", text=f"max {peak}", fill="#95a5a6", font=("Arial", 7))
+
+        def refresh():
+            if not win.winfo_exists():
+                return
+            s = self.rollup.summary()
+            per_hour = s["calls_per_active_hour"]
+            lines = [
+                f"Today: {s['calls_today']} calls, {s['wins_today']} wins ({percent(s['conversion_today'])})",
+                f"This hour: {s['calls_this_hour']} calls   Avg/hour: {per_hour:.1f}" if per_hour is not None
+                else f"This hour: {s['calls_this_hour']} calls",
+                f"Last 30 days: {s['calls_30d']} calls, {s['wins_30d']} wins ({percent(s['conversion_30d'])})",
+            ]
+            lines += [f"  {item}: {count}" for item, count in sorted(s["items_today"].items())]
+            summary_label.config(text="\n".join(lines))
+            bars(hours_canvas, s["hourly_calls"], s["hourly_wins"])
+            bars(days_canvas, s["daily_calls"], s["daily_wins"])
+            win.after(5000, refresh)
+
+        refresh()
+
     def close_app(self):
+        if self.team_sync:
+            self.team_sync.stop()
+        self.pipeline.close()
         self.config["geometry"] = self.root.geometry()
         save_config(self.config)
+        metrics.close()
         self.root.destroy()
         os._exit(0)
 
-if __name__ == "__main__":
+def main():
+    # Hook ระบบ Error ของ Python ให้มาลงที่ฟังก์ชันของเรา
+    sys.excepthook = log_exception
     root = tk.Tk()
     app = ClickCounterApp(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
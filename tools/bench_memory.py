@@ -0,0 +1,142 @@
+"""Memory benchmark for large event backlogs (default 100k events).
+
+Compares plain dicts with core.record.EventRecord, and loading a whole
+backlog with streaming it lazily, for the journal, the SQLite store and a
+legacy queue.json. Sizes come from tracemalloc; "gc_ms" is one full
+gc.collect() while the events are alive.
+
+    python tools/bench_memory.py --events 100000
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from core.eventid import new_event_id  # noqa: E402
+from core.journal import Journal  # noqa: E402
+from core.record import EventRecord, iter_json_array  # noqa: E402
+from core.store import EventStore  # noqa: E402
+
+EMPLOYEES = [f"Agent {n}" for n in range(20)]
+ITEMS = ["Clients Called", "Booked", "Voicemail", "Callback", "Not Interested"]
+CATEGORIES = ["Unspecified", "Inbound", "Outbound"]
+
+
+def make_events(count, seed=1):
+    rng = random.Random(seed)
+    for n in range(count):
+        yield {"date": "2026-01-%02d" % (1 + n % 28), "timestamp": "%02d:%02d:%02d" % (9 + n % 9, n % 60, n % 59),
+               "employees_name": rng.choice(EMPLOYEES), "works_type": "Actions",
+               "works_detail": rng.choice(ITEMS), "counts": 1, "client_name": f"client-{rng.randrange(500)}",
+               "events_category": rng.choice(CATEGORIES), "event_id": new_event_id()}
+
+
+def measure(fn):
+    """Run fn() under tracemalloc. Returns (result, retained bytes, peak bytes, seconds)."""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak, elapsed
+
+
+def gc_ms():
+    started = time.perf_counter()
+    gc.collect()
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def mb(n):
+    return round(n / 1e6, 2)
+
+
+def bench_in_memory(lines):
+    out = {}
+    for name, build in (("dict", lambda: [json.loads(line) for line in lines]),
+                        ("EventRecord", lambda: [EventRecord.from_dict(json.loads(line)) for line in lines])):
+        events, retained, _, elapsed = measure(build)
+        out[name] = {"bytes_per_event": round(retained / len(lines), 1), "total_mb": mb(retained),
+                     "build_s": round(elapsed, 3), "gc_ms": gc_ms()}
+        del events
+    return out
+
+
+def bench_backlog(name, load_all, stream):
+    def consume():
+        n = 0
+        for _ in stream():
+            n += 1
+        return n
+
+    loaded, _, peak_all, t_all = measure(load_all)
+    count = len(loaded)
+    del loaded
+    streamed, _, peak_stream, t_stream = measure(consume)
+    assert streamed == count, (name, streamed, count)
+    return {"events": count, "load_all_peak_mb": mb(peak_all), "load_all_s": round(t_all, 3),
+            "stream_peak_mb": mb(peak_stream), "stream_s": round(t_stream, 3)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--json", action="store_true", help="print one JSON object instead of a table")
+    args = parser.parse_args(argv)
+
+    work = tempfile.mkdtemp(prefix="clickmem-")
+    try:
+        events = list(make_events(args.events))
+        lines = [json.dumps(e, ensure_ascii=False) for e in events]
+        results = {"in_memory": bench_in_memory(lines)}
+
+        journal = Journal(os.path.join(work, "queue"), fsync=False)
+        for start in range(0, len(events), 1000):
+            journal.append_many(events[start:start + 1000])
+        results["journal"] = bench_backlog("journal", lambda: journal.peek(args.events), journal.iter_pending)
+        journal.close()
+
+        store = EventStore(os.path.join(work, "events.db"))
+        store.append_many(events)
+        results["store"] = bench_backlog("store", lambda: list(store.iter_pending()), store.iter_pending)
+        store.close()
+
+        legacy = os.path.join(work, "queue.json")
+        with open(legacy, "w", encoding="utf-8") as f:
+            json.dump(events, f, ensure_ascii=False)
+        del events, lines
+
+        def load_legacy():
+            with open(legacy, "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        def stream_legacy():
+            with open(legacy, "r", encoding="utf-8") as f:
+                yield from iter_json_array(f)
+
+        results["queue_json"] = bench_backlog("queue.json", load_legacy, stream_legacy)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results))
+    else:
+        for section, values in results.items():
+            print(f"[{section}]")
+            for key, value in values.items():
+                print(f"  {key:<18} {value}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Headless benchmark for the click -> persist -> send pipeline.
+
+Runs without a display: drives core.pipeline.ClickPipeline (the same code
+ClickCounterApp uses) against a local stand-in endpoint.
+
+    python tools/bench_pipeline.py --clicks 2000 --rate 200 --queue-depth 5000 --latency 0.02
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from core.breaker import CircuitBreaker  # noqa: E402
+from core.codec import encoder_from_config  # noqa: E402
+from core.offline_queue import open_backend, open_counters  # noqa: E402
+from core.paths import set_data_dir  # noqa: E402
+from core.pipeline import ClickPipeline  # noqa: E402
+from core.sender import sender_from_config  # noqa: E402
+from core.syncengine import Channel, SyncEngine  # noqa: E402
+from standin import StandInServer  # noqa: E402
+
+
+def disk_bytes_written():
+    # Linux only: bytes this process passed to write() on files (sockets are not counted)
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, int(round(pct / 100.0 * (len(values) - 1)))))
+    return values[idx]
+
+
+def wait_until(predicate, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def build_pipeline(url, args):
+    config = {
+        "employees_name": "Bench",
+        "gas_url": url,
+        "event_flush_window": args.window,
+        "bulk_upload": args.bulk,
+        "bulk_max_events": args.batch,
+        "http_workers": args.workers,
+        "http_pool_size": args.workers,
+        "http_retries": 0,
+        "storage_backend": args.backend,
+        "upload_format": args.format,
+        "upload_gzip": args.gzip,
+        "upload_aggregate": args.aggregate,
+    }
+    queue = open_backend(config)
+    sender = sender_from_config(config)
+    engine = SyncEngine(sender, endpoint_concurrency=args.concurrency)
+    engine.add_channel(Channel("primary", url, queue, sender, CircuitBreaker(base_delay=0.05, max_delay=1.0),
+                               encoder_from_config(config), bulk=args.bulk, max_events=args.batch))
+    return ClickPipeline(config, open_counters(queue), queue, engine)
+
+
+def bench_drain(pipeline, server, depth, timeout):
+    for n in range(depth):
+        pipeline.queue.append({"date": "2026-01-01", "timestamp": "09:00:00", "employees_name": "Bench",
+                               "works_type": "Actions", "works_detail": "Clients Called", "counts": 1,
+                               "client_name": f"backlog-{n}", "events_category": "Unspecified"})
+    start = time.monotonic()
+    pipeline.engine.start()
+    done = wait_until(lambda: pipeline.queue.pending_count() == 0, timeout)
+    elapsed = time.monotonic() - start
+    return {
+        "queue_depth": depth,
+        "drained": done,
+        "drain_seconds": round(elapsed, 3),
+        "drain_events_per_sec": round(depth / elapsed, 1) if elapsed else None,
+        "drain_requests": server.requests,
+        "wire_bytes_per_event": round(server.bytes_received / depth, 1) if depth else None,
+    }
+
+
+def bench_clicks(pipeline, server, clicks, rate, timeout):
+    interval = 1.0 / rate if rate else 0.0
+    sent_at = {}
+    log_time = 0.0
+    disk_before = disk_bytes_written()
+    start = time.monotonic()
+    for n in range(clicks):
+        if interval:
+            target = start + n * interval
+            delay = target - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        key = f"click-{n}"
+        t0 = time.monotonic()
+        pipeline.log("Actions", "Clients Called", 1, client_name=key, category="Unspecified")
+        log_time += time.monotonic() - t0
+        sent_at[key] = t0
+    publish_seconds = time.monotonic() - start
+
+    def all_acked():
+        with server._lock:
+            return sum(1 for _, e in server.events if e.get("client_name", "").startswith("click-")) >= clicks
+
+    wait_until(all_acked, timeout)
+    disk_after = disk_bytes_written()
+
+    with server._lock:
+        received = list(server.events)
+    latencies = [t - sent_at[e["client_name"]] for t, e in received if e.get("client_name") in sent_at]
+    return {
+        "clicks": clicks,
+        "target_rate": rate,
+        "clicks_per_sec": round(clicks / publish_seconds, 1) if publish_seconds else None,
+        "log_call_us_avg": round(log_time / clicks * 1e6, 2) if clicks else None,
+        "acked": len(latencies),
+        "p50_click_to_ack_ms": round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        "p99_click_to_ack_ms": round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+        "disk_bytes_per_click": round((disk_after - disk_before) / clicks, 1)
+        if disk_before is not None and clicks else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clicks", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=100.0, help="clicks per second, 0 = as fast as possible")
+    parser.add_argument("--queue-depth", type=int, default=0, help="backlog to drain before the click run")
+    parser.add_argument("--latency", type=float, default=0.0, help="stand-in server latency in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of requests answered 503")
+    parser.add_argument("--window", type=float, default=0.05, help="event bus coalescing window")
+    parser.add_argument("--bulk", action="store_true", help="drain the queue with bulk (array) uploads")
+    parser.add_argument("--batch", type=int, default=100, help="bulk_max_events")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=2, help="endpoint_concurrency")
+    parser.add_argument("--format", choices=("json", "compact"), default="json", help="upload_format")
+    parser.add_argument("--gzip", choices=("auto", "on", "off"), default="auto", help="upload_gzip")
+    parser.add_argument("--aggregate", action="store_true", help="upload_aggregate (per-minute net counts)")
+    parser.add_argument("--backend", choices=("sqlite", "journal"), default="sqlite", help="storage_backend")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--json", action="store_true", help="print one JSON object instead of a table")
+    args = parser.parse_args(argv)
+    args.gzip = {"auto": "auto", "on": True, "off": False}[args.gzip]
+
+    data_dir = set_data_dir(tempfile.mkdtemp(prefix="clickbench-"))
+    server = StandInServer(latency=args.latency, failure_rate=args.failure_rate, seed=1).start()
+    pipeline = build_pipeline(server.url, args).start()
+    try:
+        results = {"config": vars(args)}
+        results["drain"] = bench_drain(pipeline, server, args.queue_depth, args.timeout)
+        results["clicks"] = bench_clicks(pipeline, server, args.clicks, args.rate, args.timeout)
+        results["sender"] = pipeline.engine.sender.snapshot()
+    finally:
+        pipeline.close()
+        server.stop()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results))
+    else:
+        for section in ("drain", "clicks", "sender"):
+            print(f"[{section}]")
+            for key, value in results[section].items():
+                print(f"  {key:<26} {value}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Kill-mid-write check for the config/stats persistence layer.
+
+Starts a child process that rewrites stats.json and config.json as fast as
+it can, SIGKILLs it at a random moment, and checks that both files still
+parse and hold a complete snapshot. Repeats --runs times.
+
+    python tools/crash_persist.py --runs 200
+    python tools/crash_persist.py --runs 200 --naive   # the old open("w") + json.dump, for comparison
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+CHILD = r"""
+import json, sys
+sys.path.insert(0, {src!r})
+from core.paths import set_data_dir
+set_data_dir({data_dir!r})
+from core.config import save_config, user_config_file
+from core.stats import save_stats, stats_file
+
+naive = {naive!r}
+n = 0
+while True:
+    n += 1
+    # ขนาดไฟล์เปลี่ยนทุกรอบ ถ้าโดนตัดกลางทางจะเห็นเป็น JSON ไม่ครบ
+    stats = {{"date": "2026-01-01", "counts": {{f"item-{{i}}": n for i in range(n % 400 + 1)}}, "n": n}}
+    config = {{"employees_name": "Crash", "geometry": f"{{n}}x{{n}}", "menus": {{"A": ["x"] * (n % 300)}}, "n": n}}
+    if naive:
+        with open(stats_file(), "w", encoding="utf-8") as f:
+            json.dump(stats, f, ensure_ascii=False, indent=4)
+        with open(user_config_file(), "w", encoding="utf-8") as f:
+            json.dump(config, f, ensure_ascii=False, indent=4)
+    else:
+        save_stats(stats)
+        save_config(config)
+    if n == 1:
+        print("ready", flush=True)
+"""
+
+
+def check(path):
+    if not os.path.exists(path):
+        return "missing"
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except ValueError:
+        return "corrupt"
+    return "ok" if isinstance(data, dict) and "n" in data else "incomplete"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--max-delay", type=float, default=0.3, help="kill after up to this many seconds")
+    parser.add_argument("--naive", action="store_true")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+    rng = random.Random(args.seed)
+
+    results = {"ok": 0, "corrupt": 0, "incomplete": 0, "missing": 0}
+    for _ in range(args.runs):
+        data_dir = tempfile.mkdtemp(prefix="clickcrash-")
+        code = CHILD.format(src=SRC, data_dir=data_dir, naive=args.naive)
+        child = subprocess.Popen([sys.executable, "-c", code], stdout=subprocess.PIPE)
+        child.stdout.readline()
+        time.sleep(rng.uniform(0, args.max_delay))
+        child.kill()
+        child.wait()
+        for name in ("stats.json", "config.json"):
+            results[check(os.path.join(data_dir, name))] += 1
+
+    print(f"{args.runs} kills, {sum(results.values())} files checked: {results}")
+    return 1 if results["corrupt"] or results["incomplete"] or results["missing"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- Local Static File Server for update tests ---
+# Serves files from one directory with HTTP Range support (what a GitHub
+# release asset / CDN does). `drop_after` cuts every response off after that
+# many body bytes to simulate a slow site link aborting mid-download.
+# Responses carry an ETag (mtime + size, like nginx) and a matching
+# If-None-Match gets 304 Not Modified, for the team config poller.
+#
+#     python tools/fileserver.py dist 8000
+
+
+class StaticFileServer:
+    def __init__(self, directory, host="127.0.0.1", port=0, drop_after=None, ranges=True):
+        self.directory = directory
+        self.drop_after = drop_after
+        self.ranges = ranges
+        self.requests = []        # (path, Range header or None)
+        self.bytes_sent = 0
+        self.not_modified = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    def url(self, name):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/{name}"
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                path = os.path.join(server.directory, os.path.basename(self.path.split("?")[0]))
+                range_header = self.headers.get("Range") if server.ranges else None
+                with server._lock:
+                    server.requests.append((self.path, range_header))
+                if not os.path.isfile(path):
+                    self.send_error(404)
+                    return
+                stat = os.stat(path)
+                size = stat.st_size
+                etag = '"%x-%x"' % (stat.st_mtime_ns, size)
+                if self.headers.get("If-None-Match") == etag:
+                    with server._lock:
+                        server.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                start = 0
+                if range_header and range_header.startswith("bytes="):
+                    start = int(range_header[6:].split("-")[0] or 0)
+                    if start >= size:
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{size}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{size - 1}/{size}")
+                else:
+                    self.send_response(200)
+                    self.send_header("Accept-Ranges", "bytes" if server.ranges else "none")
+                self.send_header("ETag", etag)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(size - start))
+                self.end_headers()
+
+                budget = server.drop_after if server.drop_after is not None else size
+                sent = start
+                with open(path, "rb") as f:
+                    f.seek(start)
+                    while budget > 0:
+                        chunk = f.read(min(64 * 1024, budget))
+                        if not chunk:
+                            break
+                        self.wfile.write(chunk)
+                        budget -= len(chunk)
+                        sent += len(chunk)
+                        with server._lock:
+                            server.bytes_sent += len(chunk)
+                if sent < size:
+                    # จำลองเน็ตหลุดกลางทาง
+                    self.close_connection = True
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if __name__ == "__main__":
+    import sys
+    directory = sys.argv[1] if len(sys.argv) > 1 else "."
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8000
+    srv = StaticFileServer(directory, host="0.0.0.0", port=port)
+    print(f"Serving {os.path.abspath(directory)} on port {port}")
+    srv._server.serve_forever()
@@ -0,0 +1,53 @@
+"""Measure the cold import time of the headless core in a fresh interpreter.
+
+    python tools/import_time.py [--runs 5]
+
+Fails (exit 1) if importing core pulls in tkinter, pystray, PIL, win32 or requests.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+CORE_MODULES = ["core.config", "core.stats", "core.offline_queue", "core.sender", "core.pipeline"]
+FORBIDDEN = ["tkinter", "pystray", "PIL", "win32gui", "win32process", "requests"]
+
+PROBE = """
+import sys, time
+t = time.perf_counter()
+import {modules}
+elapsed = time.perf_counter() - t
+heavy = [m for m in {forbidden!r} if m in sys.modules]
+print(elapsed, ",".join(heavy))
+"""
+
+
+def measure_once():
+    code = PROBE.format(modules=", ".join(CORE_MODULES), forbidden=FORBIDDEN)
+    out = subprocess.run([sys.executable, "-c", code], cwd=SRC_DIR, capture_output=True,
+                         text=True, check=True).stdout.split()
+    return float(out[0]), (out[1].split(",") if len(out) > 1 else [])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    timings = []
+    heavy = []
+    for _ in range(args.runs):
+        elapsed, heavy = measure_once()
+        timings.append(elapsed)
+    timings.sort()
+    print(f"core import: best {timings[0] * 1000:.1f} ms, median {timings[len(timings) // 2] * 1000:.1f} ms")
+    if heavy:
+        print(f"heavy modules imported by core: {', '.join(heavy)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+"""Load-test simulator: N virtual seats against a local endpoint, with outages.
+
+Every seat is a headless copy of the client: its own queue (journal or
+SQLite), RunningCounters, ClickPipeline, SyncEngine, HttpSender and
+circuit breaker, configured like ClickCounterApp. Seats click with
+Poisson arrivals at a per-seat rate (log-normal across seats) and a
+realistic item mix. The endpoint (tools/standin.py, or src/ingest_server.py
+with --target ingest) is taken down for each --outage window. The report
+shows:
+  * request rate per second, before / during / after the outages
+    (thundering herd = peak after recovery vs the steady-state rate),
+  * 503s served while down (retry pressure),
+  * drain convergence: seconds from recovery until every seat's queue is
+    empty again,
+  * delivery: net counts logged vs received (deduplicated by event_id).
+
+    python tools/loadsim.py --seats 300 --duration 60 --outage 15:20
+    python tools/loadsim.py --seats 100 --outage 10:5 --outage 30:10 --target ingest --json
+"""
+import argparse
+import heapq
+import json
+import math
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+TOOLS = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [TOOLS, os.path.join(TOOLS, "..", "src")]
+
+from core.counters import RunningCounters  # noqa: E402
+from core.journal import Journal  # noqa: E402
+from core.pipeline import ClickPipeline  # noqa: E402
+from core.sender import sender_from_config  # noqa: E402
+from core.store import EventStore  # noqa: E402
+from core.syncengine import SyncEngine, channels_from_config  # noqa: E402
+from standin import StandInServer  # noqa: E402
+
+# (menu, item, weight) — call-floor mix: mostly calls, a few wins
+ITEM_MIX = (("Actions", "Clients Called", 55), ("Actions", "Voicemail", 20), ("Actions", "Callback", 10),
+            ("Actions", "Not Interested", 8), ("Wins", "Booked", 5), ("Wins", "Sold", 2))
+CORRECTION_RATE = 0.03   # กดผิดแล้วกด -1 แก้
+FLUSH_WINDOW = 1.0
+
+
+class Seat:
+    def __init__(self, n, url, root, args):
+        self.n = n
+        self.config = {
+            "employees_name": f"Seat {n:03d}", "gas_url": url, "bulk_upload": True,
+            "bulk_max_events": args.batch, "upload_format": args.format, "event_flush_window": FLUSH_WINDOW,
+            "http_workers": 1, "http_pool_size": 1, "http_retries": args.http_retries,
+            "http_connect_timeout": 2, "http_read_timeout": 5,
+            "backoff_base_seconds": args.backoff_base, "backoff_max_seconds": args.backoff_max,
+        }
+        path = os.path.join(root, f"seat-{n:03d}")
+        if args.backend == "sqlite":
+            os.makedirs(path, exist_ok=True)
+            self.queue = EventStore(os.path.join(path, "events.db"))
+        else:
+            self.queue = Journal(path, fsync=False)
+        self.sender = sender_from_config(self.config)
+        self.engine = SyncEngine(self.sender, endpoint_concurrency=args.endpoint_concurrency)
+        for channel in channels_from_config(self.config, self.queue, self.sender):
+            self.engine.add_channel(channel)
+        self.pipeline = ClickPipeline(self.config, RunningCounters(), self.queue, self.engine)
+        self.rate = 0.0   # clicks per second
+        self.logged = 0   # net counts
+
+    def start(self):
+        self.pipeline.start()
+        self.engine.start()
+        return self
+
+    def click(self, rng):
+        r = rng.uniform(0, sum(w for _, _, w in ITEM_MIX))
+        for menu, item, weight in ITEM_MIX:
+            r -= weight
+            if r <= 0:
+                break
+        self.pipeline.log(menu, item, 1, client_name=f"c{rng.randrange(10000)}")
+        self.logged += 1
+        if rng.random() < CORRECTION_RATE:
+            self.pipeline.log(menu, item, -1)
+            self.logged -= 1
+
+    def pending(self):
+        try:
+            return self.queue.pending_count()
+        except Exception:
+            return 0
+
+    def close(self):
+        self.pipeline.close()
+        self.sender.close()
+
+
+def gate(server):
+    """Wrap server.handle_post with an outage switch and a request log."""
+    server.sim_down = False
+    server.sim_log = []          # (monotonic time, status)
+    original = server.handle_post
+    lock = threading.Lock()
+
+    def handle_post(headers, body):
+        if server.sim_down:
+            status, reply = 503, {"status": "unavailable"}
+        else:
+            status, reply = original(headers, body)
+        with lock:
+            server.sim_log.append((time.monotonic(), status))
+        return status, reply
+
+    server.handle_post = handle_post
+    return server
+
+
+def parse_outage(text):
+    start, length = text.split(":")
+    return float(start), float(length)
+
+
+def received_counts(server):
+    if hasattr(server, "events"):
+        with server._lock:
+            return sum(e.get("counts", 0) for _, e in server.events), server.duplicates
+    with server.store._lock:
+        total = server.store._conn.execute("SELECT COALESCE(SUM(counts), 0) FROM events").fetchone()[0]
+    return total, None
+
+
+def run(args):
+    root = tempfile.mkdtemp(prefix="clicksim-")
+    if args.target == "ingest":
+        from ingest_server import IngestServer
+        server = IngestServer(os.path.join(root, "ingest.db"))
+    else:
+        server = StandInServer(latency=args.latency)
+    server = gate(server).start()
+    rng = random.Random(args.seed)
+
+    print(f"starting {args.seats} seats ...", file=sys.stderr)
+    with ThreadPoolExecutor(16) as pool:
+        seats = list(pool.map(lambda n: Seat(n, server.url, root, args).start(), range(args.seats)))
+    sigma = 0.5
+    for seat in seats:
+        seat.rate = rng.lognormvariate(math.log(args.clicks_per_minute / 60.0) - sigma ** 2 / 2, sigma)
+
+    outages = sorted(parse_outage(o) for o in args.outage)
+    started = time.monotonic()
+    # คิวเวลาคลิกถัดไปของทุก seat (thread เดียวคุมทุกเครื่อง); ทุกคนเริ่มภายใน --ramp วินาที
+    heap = [(started + rng.uniform(0, args.ramp), seat.n) for seat in seats]
+    heapq.heapify(heap)
+    backlog = []                 # (t, total pending)
+    next_sample = started
+    recovered_at = {}            # outage index -> time endpoint came back
+    converged_at = {}
+    end = started + args.duration
+
+    while True:
+        now = time.monotonic()
+        t = now - started
+        down = any(s <= t < s + length for s, length in outages)
+        if down != server.sim_down:
+            server.sim_down = down
+            print(f"[{t:6.1f}s] endpoint {'DOWN' if down else 'UP'}", file=sys.stderr)
+        for i, (s, length) in enumerate(outages):
+            if t >= s + length and i not in recovered_at:
+                recovered_at[i] = started + s + length
+        if now >= next_sample:
+            total = sum(seat.pending() for seat in seats)
+            backlog.append((now, total))
+            for i, at in recovered_at.items():
+                if i not in converged_at and total == 0 and now >= at:
+                    converged_at[i] = now
+            next_sample = now + args.sample
+            # รอให้ event bus (หน้าต่าง 1 วินาที) เทคลิกสุดท้ายลงคิวก่อน แล้วคิวต้องว่าง
+            if now >= end + FLUSH_WINDOW + 0.5 and total == 0 and len(converged_at) == len(outages):
+                break
+            if now >= end + args.settle:
+                break
+        while heap and heap[0][0] <= now and now < end:
+            due, n = heapq.heappop(heap)
+            seats[n].click(rng)
+            heapq.heappush(heap, (due + rng.expovariate(seats[n].rate), n))
+        time.sleep(min(0.01, max(0.0, (heap[0][0] if heap else now + 0.01) - time.monotonic())))
+
+    finished = time.monotonic()
+    print("stopping seats ...", file=sys.stderr)
+    with ThreadPoolExecutor(32) as pool:
+        list(pool.map(lambda s: s.close(), seats))
+    time.sleep(0.2)
+    received, duplicates = received_counts(server)
+    log = list(server.sim_log)
+    server.stop()
+    shutil.rmtree(root, ignore_errors=True)
+    return report(args, started, finished, outages, log, backlog, recovered_at, converged_at,
+                  sum(s.logged for s in seats), received, duplicates)
+
+
+def report(args, started, finished, outages, log, backlog, recovered_at, converged_at, logged, received,
+           duplicates):
+    seconds = int(math.ceil(finished - started))
+    per_second = [[0, 0] for _ in range(seconds + 1)]   # [requests, 503s]
+    for t, status in log:
+        idx = min(seconds, max(0, int(t - started)))
+        per_second[idx][0] += 1
+        if status == 503:
+            per_second[idx][1] += 1
+    backlog_per_second = [0] * (seconds + 1)
+    for t, total in backlog:
+        idx = min(seconds, max(0, int(t - started)))
+        backlog_per_second[idx] = max(backlog_per_second[idx], total)
+
+    def window(a, b):
+        return [per_second[i][0] for i in range(max(0, int(a)), min(len(per_second), int(b)))]
+
+    first_outage = outages[0][0] if outages else args.duration
+    steady = window(args.ramp, first_outage) or window(0, first_outage) or [0]
+    baseline = statistics.median(steady)
+    outage_reports = []
+    for i, (s, length) in enumerate(outages):
+        after = window(s + length, s + length + args.herd_window) or [0]
+        during = window(s, s + length)
+        rec = recovered_at.get(i)
+        conv = converged_at.get(i)
+        outage_reports.append({
+            "start_s": s, "length_s": length,
+            "requests_during": sum(during),
+            "requests_per_s_during": round(sum(during) / length, 1) if length else 0,
+            "peak_requests_per_s_after": max(after),
+            "herd_ratio": round(max(after) / baseline, 2) if baseline else None,
+            "backlog_at_recovery": max((b for t, b in backlog if rec and t <= rec), default=0)
+            if rec else None,
+            "drain_convergence_s": round(conv - rec, 2) if conv and rec else None,
+        })
+    return {
+        "config": {k: v for k, v in vars(args).items() if k != "json"},
+        "requests": len(log),
+        "rejected_503": sum(1 for _, status in log if status == 503),
+        "steady_requests_per_s": baseline,
+        "outages": outage_reports,
+        "counts_logged": logged,
+        "counts_received": received,
+        "server_deduplicated": duplicates,
+        "timeline": [{"t": i, "requests": r, "503": f, "backlog": backlog_per_second[i]}
+                     for i, (r, f) in enumerate(per_second)],
+    }
+
+
+def print_report(result):
+    for key in ("requests", "rejected_503", "steady_requests_per_s", "counts_logged", "counts_received",
+                "server_deduplicated"):
+        print(f"{key:<24} {result[key]}")
+    for o in result["outages"]:
+        print(f"outage @{o['start_s']:g}s for {o['length_s']:g}s:")
+        for key, value in o.items():
+            if key not in ("start_s", "length_s"):
+                print(f"  {key:<30} {value}")
+    print("\n   t  req  503  backlog")
+    peak = max((row["requests"] for row in result["timeline"]), default=0) or 1
+    for row in result["timeline"]:
+        bar = "#" * int(40 * row["requests"] / peak)
+        print(f"{row['t']:>4} {row['requests']:>4} {row['503']:>4} {row['backlog']:>8}  {bar}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seats", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds of clicking")
+    parser.add_argument("--ramp", type=float, default=5.0, help="seats start clicking within this many seconds")
+    parser.add_argument("--clicks-per-minute", type=float, default=6.0, help="mean per seat")
+    parser.add_argument("--outage", action="append", default=[], metavar="START:LENGTH",
+                        help="endpoint down from START for LENGTH seconds (repeatable)")
+    parser.add_argument("--target", choices=("standin", "ingest"), default="standin")
+    parser.add_argument("--latency", type=float, default=0.02, help="stand-in latency per request")
+    parser.add_argument("--backend", choices=("journal", "sqlite"), default="journal")
+    parser.add_argument("--format", choices=("json", "compact"), default="json", help="upload_format")
+    parser.add_argument("--batch", type=int, default=100, help="bulk_max_events")
+    parser.add_argument("--http-retries", type=int, default=2)
+    parser.add_argument("--backoff-base", type=float, default=5.0, help="backoff_base_seconds")
+    parser.add_argument("--backoff-max", type=float, default=60.0, help="backoff_max_seconds")
+    parser.add_argument("--endpoint-concurrency", type=int, default=2)
+    parser.add_argument("--herd-window", type=float, default=10.0, help="seconds after recovery to scan for the peak")
+    parser.add_argument("--settle", type=float, default=120.0, help="max seconds to wait for queues to drain")
+    parser.add_argument("--sample", type=float, default=0.25, help="backlog sampling interval")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print one JSON object instead of a table")
+    args = parser.parse_args(argv)
+
+    result = run(args)
+    if args.json:
+        print(json.dumps(result))
+    else:
+        print_report(result)
+    return result
+
+
+if __name__ == "__main__":
+    main()
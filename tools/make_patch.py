@@ -0,0 +1,76 @@
+"""Emit a delta patch between two builds and record it in version.json.
+
+    python tools/make_patch.py previous/ClickCounter.exe dist/ClickCounter.exe ^
+        --from v260118003 --to v260201001 ^
+        --base-url https://github.com/Kasinchin/pp-click-counter/releases/download/v260201001/ ^
+        --manifest version.json
+
+Writes dist/ClickCounter-<from>-<to>.ccpatch, then updates the manifest:
+"version", "url" and "sha256" of the full exe, plus a "patches" chain entry
+{"from", "to", "url", "sha256"}. Patches that are not clearly smaller than
+the full exe are not published (clients just download the exe).
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from core.patch import apply_patch, make_patch  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("old_exe")
+    parser.add_argument("new_exe")
+    parser.add_argument("--from", dest="from_version", required=True)
+    parser.add_argument("--to", dest="to_version", required=True)
+    parser.add_argument("--base-url", required=True, help="release download URL prefix (ends with /)")
+    parser.add_argument("--manifest", default="version.json")
+    parser.add_argument("--out-dir", default="dist")
+    parser.add_argument("--keep", type=int, default=5, help="patch entries kept in the chain")
+    parser.add_argument("--max-ratio", type=float, default=0.7,
+                        help="skip the patch if it is larger than this fraction of the full exe")
+    args = parser.parse_args(argv)
+
+    with open(args.old_exe, "rb") as f:
+        old = f.read()
+    with open(args.new_exe, "rb") as f:
+        new = f.read()
+    new_sha = hashlib.sha256(new).hexdigest()
+
+    with open(args.manifest, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    exe_name = os.path.basename(args.new_exe)
+    manifest["version"] = args.to_version
+    manifest["url"] = args.base_url + exe_name
+    manifest["sha256"] = new_sha
+    patches = [p for p in manifest.get("patches", []) if p.get("to") != args.to_version]
+
+    patch = make_patch(old, new)
+    # ตรวจซ้ำก่อนเผยแพร่: patch ต้องสร้างไฟล์ใหม่ได้ตรงทุก byte
+    assert apply_patch(old, patch) == new
+    ratio = len(patch) / max(1, len(new))
+    if ratio <= args.max_ratio:
+        patch_name = f"ClickCounter-{args.from_version}-{args.to_version}.ccpatch"
+        os.makedirs(args.out_dir, exist_ok=True)
+        with open(os.path.join(args.out_dir, patch_name), "wb") as f:
+            f.write(patch)
+        patches.append({"from": args.from_version, "to": args.to_version,
+                        "url": args.base_url + patch_name,
+                        "sha256": hashlib.sha256(patch).hexdigest()})
+        print(f"Patch {patch_name}: {len(patch):,} bytes ({ratio:.1%} of {len(new):,})")
+    else:
+        print(f"Patch would be {ratio:.1%} of the full exe, not published")
+
+    manifest["patches"] = patches[-args.keep:]
+    with open(args.manifest, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    print(f"{args.manifest}: {args.to_version} sha256 {new_sha}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Run several app instances against one data dir and check every click is sent exactly once.
+
+Each worker process opens the shared data dir with the selected backend,
+logs --clicks events through the real ClickPipeline/SyncEngine and exits
+once the shared queue is empty (or --kill-after seconds to simulate a
+crash). The parent then checks what the stand-in endpoint received.
+
+    python tools/multiproc_check.py --procs 4 --clicks 300
+    python tools/multiproc_check.py --procs 4 --clicks 300 --backend journal
+    python tools/multiproc_check.py --procs 3 --clicks 300 --kill-after 0.5
+"""
+import argparse
+import collections
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+TOOLS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TOOLS, "..", "src"))
+
+from standin import StandInServer  # noqa: E402
+
+BATCH = 20
+# endpoint_concurrency (2) batches can be in flight when a worker is killed
+IN_FLIGHT_LIMIT = 2 * BATCH
+
+WORKER = r"""
+import sys, time
+sys.path[:0] = [{src!r}]
+from core.paths import set_data_dir
+set_data_dir({data_dir!r})
+from core.offline_queue import open_backend, open_counters, open_outbox
+from core.pipeline import ClickPipeline
+from core.sender import sender_from_config
+from core.syncengine import SyncEngine, channels_from_config
+
+config = {{"employees_name": "W{n}", "gas_url": {url!r}, "storage_backend": {backend!r},
+          "event_flush_window": 0.02, "bulk_upload": True, "bulk_max_events": {batch}, "http_retries": 0,
+          "backoff_base_seconds": 0.05, "backoff_max_seconds": 0.5, "store_lease_seconds": 2}}
+queue = open_backend(config)
+sender = sender_from_config(config)
+engine = SyncEngine(sender)
+for channel in channels_from_config(config, queue, sender, open_journal=open_outbox):
+    engine.add_channel(channel)
+pipeline = ClickPipeline(config, open_counters(queue), queue, engine).start()
+engine.start()
+for i in range({clicks}):
+    pipeline.log("Actions", "Clients Called", 1, client_name="w{n}-%d" % i)
+    time.sleep(0.001)
+deadline = time.monotonic() + {timeout}
+while queue.pending_count() and time.monotonic() < deadline:
+    engine.notify()
+    time.sleep(0.05)
+pipeline.close()
+"""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--procs", type=int, default=4)
+    parser.add_argument("--clicks", type=int, default=200)
+    parser.add_argument("--backend", choices=("sqlite", "journal"), default="sqlite")
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--kill-after", type=float, default=None,
+                        help="SIGKILL worker 0 after this many seconds, then run a recovery instance")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args(argv)
+
+    data_dir = tempfile.mkdtemp(prefix="clickmulti-")
+    server = StandInServer(latency=args.latency).start()
+
+    def spawn(n, clicks):
+        code = WORKER.format(src=os.path.join(TOOLS, "..", "src"), data_dir=data_dir, url=server.url,
+                             backend=args.backend, n=n, clicks=clicks, timeout=args.timeout,
+                             batch=BATCH)
+        return subprocess.Popen([sys.executable, "-c", code])
+
+    started = time.monotonic()
+    workers = [spawn(n, args.clicks) for n in range(args.procs)]
+    if args.kill_after is not None:
+        time.sleep(args.kill_after)
+        workers[0].kill()
+    for worker in workers:
+        worker.wait()
+    if args.kill_after is not None:
+        # เครื่องเปิดโปรแกรมใหม่หลัง crash: ต้องส่งของที่ค้างอยู่ต่อจนหมด
+        # (SQLite: รอ lease ของ process ที่ตายหมดอายุ)
+        recovery = spawn(args.procs, 0)
+        recovery.wait()
+    elapsed = time.monotonic() - started
+
+    with server._lock:
+        keys = [e.get("client_name") for _, e in server.events]
+        deduped = server.duplicates
+    server.stop()
+    shutil.rmtree(data_dir, ignore_errors=True)
+
+    counts = collections.Counter(keys)
+    duplicates = {k: c for k, c in counts.items() if c > 1}
+    expected = {f"w{n}-{i}" for n in range(args.procs) for i in range(args.clicks)}
+    missing = expected - set(counts)
+    redelivered = {}
+    if args.kill_after is not None:
+        # clicks ของ worker ที่ถูก kill ก่อนถูกบันทึกลงดิสก์หายได้ (ไม่นับ) และ batch ที่มันส่งถึง
+        # server แล้วแต่ยังไม่ทัน ack จะถูกส่งซ้ำหนึ่งครั้ง (at-least-once) นับแยกไว้
+        # ใน SQLite แถวที่มันจองไว้เป็นของ worker ไหนก็ได้ แต่ไม่เกินที่ส่งพร้อมกันได้
+        missing = {k for k in missing if not k.startswith("w0-")}
+        if len(duplicates) <= IN_FLIGHT_LIMIT and all(c == 2 for c in duplicates.values()):
+            redelivered, duplicates = duplicates, {}
+    result = {"procs": args.procs, "backend": args.backend, "received": len(keys),
+              "unique": len(counts), "duplicates": len(duplicates), "missing": len(missing),
+              "crash_redeliveries": len(redelivered), "server_deduped": deduped, "seconds": round(elapsed, 2)}
+    print(json.dumps(result))
+    return 1 if duplicates or missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
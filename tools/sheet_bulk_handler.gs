@@ -0,0 +1,57 @@
+// ClickCounter sheet endpoint with bulk support (Google Apps Script).
+//
+// Paste into the spreadsheet's Apps Script project (Extensions > Apps
+// Script), replacing the old doPost, then Deploy > Manage deployments >
+// edit the web app > New version, so the existing /exec URL keeps working.
+//
+// Accepts either body the clients and the ingest server send:
+//   - one event object (the app's default per-click upload)
+//   - a JSON array of events (bulk_upload on, or src/ingest_server.py's
+//     forwarder, which sends up to --forward-batch events per request)
+// Every request is written with a single setValues() call under the script
+// lock, so a 500-event batch costs one sheet write instead of 500.
+//
+// COLUMNS must match the sheet's header order. event_id is appended last;
+// drop it from the list if the sheet should not keep it.
+
+var SHEET_NAME = "";  // empty = first sheet of the spreadsheet
+var COLUMNS = ["date", "timestamp", "employees_name", "works_type", "works_detail",
+               "counts", "client_name", "events_category", "event_id"];
+
+function doPost(e) {
+  var payload;
+  try {
+    payload = JSON.parse(e.postData.contents);
+  } catch (err) {
+    return reply_({status: "error", message: "bad payload"});
+  }
+  var events = Array.isArray(payload) ? payload : [payload];
+  var rows = [];
+  for (var i = 0; i < events.length; i++) {
+    var event = events[i];
+    if (!event || typeof event !== "object") {
+      continue;
+    }
+    rows.push(COLUMNS.map(function (name) {
+      var value = event[name];
+      return value === undefined || value === null ? "" : value;
+    }));
+  }
+  if (rows.length) {
+    var lock = LockService.getScriptLock();
+    lock.waitLock(30000);
+    try {
+      var spreadsheet = SpreadsheetApp.getActiveSpreadsheet();
+      var sheet = SHEET_NAME ? spreadsheet.getSheetByName(SHEET_NAME) : spreadsheet.getSheets()[0];
+      sheet.getRange(sheet.getLastRow() + 1, 1, rows.length, COLUMNS.length).setValues(rows);
+    } finally {
+      lock.releaseLock();
+    }
+  }
+  return reply_({status: "success", count: rows.length});
+}
+
+function reply_(body) {
+  return ContentService.createTextOutput(JSON.stringify(body))
+      .setMimeType(ContentService.MimeType.JSON);
+}
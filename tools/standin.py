@@ -0,0 +1,121 @@
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from core.codec import decode_body  # noqa: E402
+
+# --- Local Stand-in for the Google Apps Script endpoint ---
+# Accepts a single event dict (legacy), a JSON array (bulk mode) or a
+# compact "cc1" batch, optionally gzip'ed, and answers 200 like the real web
+# app. Latency, random failures and full outages are tunable so benchmarks
+# and simulators can run offline.
+#
+# Events carrying an event_id are deduplicated: a retried batch is stored
+# once and every ID received is echoed back in "accepted", so a client
+# whose request timed out after the server got it can simply send again.
+# `reply_delay` holds the 200 back after storing, to simulate exactly that.
+
+
+class StandInServer:
+    def __init__(self, latency=0.0, failure_rate=0.0, seed=None, host="127.0.0.1", port=0,
+                 accept_gzip=True, reply_delay=0.0):
+        self.latency = latency
+        self.reply_delay = reply_delay
+        self.accept_gzip = accept_gzip
+        self.failure_rate = failure_rate
+        self.down = False
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.events = []          # (monotonic receive time, event)
+        self.requests = 0
+        self.failures = 0
+        self.bytes_received = 0
+        self.duplicates = 0
+        self._seen_ids = set()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/exec"
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if server.accept_gzip:
+                    self.send_header("Accept-Encoding", "gzip")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                status, reply = server.handle_post(self.headers, body)
+                self._reply(status, reply)
+
+            def do_GET(self):
+                with server._lock:
+                    self._reply(200, {"events": len(server.events), "requests": server.requests,
+                                      "duplicates": server.duplicates})
+
+        return Handler
+
+    def handle_post(self, headers, body):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.requests += 1
+            self.bytes_received += len(body)
+            if self.down or self._rng.random() < self.failure_rate:
+                self.failures += 1
+                return 503, {"status": "unavailable"}
+        try:
+            events = decode_body(body, headers)
+        except Exception:
+            return 400, {"status": "bad payload"}
+        now = time.monotonic()
+        accepted = []
+        duplicates = 0
+        with self._lock:
+            for e in events:
+                event_id = e.get("event_id")
+                if event_id:
+                    accepted.append(event_id)
+                    if event_id in self._seen_ids:
+                        duplicates += 1
+                        continue
+                    self._seen_ids.add(event_id)
+                self.events.append((now, e))
+            self.duplicates += duplicates
+        if self.reply_delay:
+            time.sleep(self.reply_delay)
+        return 200, {"status": "success", "count": len(events) - duplicates, "accepted": accepted,
+                     "duplicates": duplicates}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()